@@ -1,12 +1,32 @@
 import streamlit as st
-from transformers import pipeline
 import re
 import tempfile
-import whisper
-import torch
 import matplotlib.pyplot as plt
 import os
 import shutil
+import hashlib
+import json
+import codecs
+import logging
+import difflib
+import threading
+import functools
+import contextvars
+import time
+import uuid
+import io
+import csv
+import zipfile
+import struct
+import subprocess
+import gc
+from contextlib import contextmanager
+from typing import NamedTuple
+from enum import IntEnum
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
 
 # 한글 폰트 설정 (Windows용 기본 설정)
 def set_korean_font():
@@ -16,46 +36,970 @@ def set_korean_font():
         pass
 set_korean_font()
 
-# 모델 로딩 (캐싱)
-@st.cache_resource(show_spinner=False)
-def load_emotion_model():
-    return pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True)
-emotion_analyzer = load_emotion_model()
+# 모델 로딩 (캐싱, 처음 사용할 때 로딩)
+EMOTION_MODEL_NAME = "j-hartmann/emotion-english-distilroberta-base"
+# 한국어 텍스트는 다국어 감정 모델로 분석한 뒤 라벨을 영어 모델 라벨로 옮김 (EMOTION_LANGUAGE_ROUTING=0이면 모두 영어 모델)
+KOREAN_EMOTION_MODEL_NAME = os.environ.get("KOREAN_EMOTION_MODEL_NAME", "MilaNLProc/xlm-emo-t")
+KOREAN_EMOTION_LABEL_MAP = json.loads(os.environ.get(
+    "KOREAN_EMOTION_LABEL_MAP", '{"anger": "anger", "fear": "fear", "joy": "joy", "sadness": "sadness"}'
+))
+EMOTION_LANGUAGE_ROUTING = os.environ.get("EMOTION_LANGUAGE_ROUTING", "1") == "1"
+EMOTION_MODELS = {"en": EMOTION_MODEL_NAME, "ko": KOREAN_EMOTION_MODEL_NAME}
+EMOTION_LABELS = ("anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise")
+WHISPER_MODEL_NAME = os.environ.get("WHISPER_MODEL_NAME", "small")
+# 음성 탭에서 고를 수 있는 Whisper 크기 (예: "small,medium" — 큰 모델을 추가할 때는 MODEL_MEMORY_BUDGET_MB도 함께 늘림)
+WHISPER_MODEL_CHOICES = list(dict.fromkeys([WHISPER_MODEL_NAME] + [
+    name.strip() for name in os.environ.get("WHISPER_MODEL_CHOICES", "").split(",") if name.strip()
+]))
+PREWARM_WHISPER = os.environ.get("PREWARM_WHISPER", "0") == "1"
+# 비워 두면 입력마다 첫 구간에서 한 번만 감지한 언어를 나머지 구간에 고정
+WHISPER_LANGUAGE = os.environ.get("WHISPER_LANGUAGE") or None
+
+# 추론 백엔드 설정
+# - 감정 모델: torch(기본) | int8(PyTorch 동적 양자화) | onnx(ONNX Runtime) | onnx-int8(ONNX Runtime + 동적 양자화)
+# - Whisper: torch(기본) | int8(PyTorch 동적 양자화) | faster(faster-whisper/CTranslate2 int8)
+EMOTION_BACKEND = os.environ.get("EMOTION_BACKEND", "torch")
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "torch")
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sung2158", "models"))
+
+# 오프라인 번들 (bundle_models.py로 만든 디렉터리에서 모델을 읽어 인터넷 연결 없이 실행)
+MODEL_BUNDLE_DIR = os.environ.get("MODEL_BUNDLE_DIR", "")
+OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "1" if MODEL_BUNDLE_DIR else "0") == "1"
+if OFFLINE_MODE:
+    # transformers/huggingface_hub는 처음 import할 때 이 값을 읽으므로 모델 로딩 전에 설정
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+BACKEND_PARITY_CHECK = os.environ.get("BACKEND_PARITY_CHECK", "0") == "1"
+BACKEND_PARITY_TOLERANCE = float(os.environ.get("BACKEND_PARITY_TOLERANCE", 0.05))
+# Whisper 백엔드 비교에 쓸 음성 파일 (합성 음성은 인식 결과가 비어 비교가 의미 없으므로 실제 녹음 필요)
+WHISPER_PARITY_AUDIO = os.environ.get("WHISPER_PARITY_AUDIO", "")
+WHISPER_PARITY_MIN_SIMILARITY = float(os.environ.get("WHISPER_PARITY_MIN_SIMILARITY", 0.9))
+PARITY_SAMPLE_TEXTS = [
+    "I am so happy to see you again, this is wonderful news.",
+    "I can't sleep at night and I feel hopeless about everything.",
+    "Why did you do that? I am really angry with you.",
+    "I'm scared that something bad will happen tomorrow.",
+    "The meeting is scheduled for three o'clock in room two.",
+]
+
+logger = logging.getLogger(__name__)
+
+# 모델 레지스트리 (요청 시 로딩, 사용 중인 모델은 참조 수로 보호, 메모리 예산을 넘으면 가장 오래 쓰지 않은 모델부터 해제)
+# 기본 예산은 Whisper small(fp32 약 1GB)과 감정 모델 두 개(약 0.3GB, 1.1GB)가 함께 상주하는 크기
+# Whisper medium(fp32 약 2.9GB)을 고를 수 있게 하려면 5GB 이상으로 늘려야 모델끼리 서로 밀어내지 않음
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", 3072))
+
+class ModelEntry:
+    def __init__(self, key: str):
+        self.key = key
+        self.model = None
+        self.size_bytes = 0
+        self.refs = 0
+        self.last_used = None
+        self.load_lock = threading.Lock()
+
+class ModelRegistry:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # 앞쪽일수록 오래 사용하지 않은 모델
+        self.stats = {}  # 해제된 뒤에도 유지되는 모델별 누적 통계
+
+    @contextmanager
+    def acquire(self, key: str, loader):
+        entry = self._checkout(key, loader)
+        try:
+            yield entry.model
+        finally:
+            with self.lock:
+                entry.refs -= 1
+                entry.last_used = time.time()
+                self._evict()
+
+    # 미리 로딩만 하고 참조는 바로 놓음 (모델 객체는 돌려주지 않음 — 쓰는 동안에는 acquire로 참조를 잡아야 해제되지 않음)
+    def preload(self, key: str, loader):
+        with self.acquire(key, loader):
+            pass
+
+    def _checkout(self, key: str, loader) -> ModelEntry:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = ModelEntry(key)
+            self.entries.move_to_end(key)
+            entry.refs += 1
+            stats = self.stats.setdefault(key, {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "load_sec": 0.0})
+            stats["hits" if entry.model is not None else "misses"] += 1
+
+        # 같은 모델을 여러 세션이 동시에 요청해도 한 번만 로딩 (다른 모델 사용은 막지 않음)
+        try:
+            with entry.load_lock:
+                if entry.model is None:
+                    with self.lock:
+                        # 이전에 측정한 크기가 있으면 로딩 전에 미리 자리를 비움
+                        self._evict(reserve=stats.get("size_bytes", 0))
+                    started = time.perf_counter()
+                    model = loader()
+                    # 프로세스 RSS 변화는 다른 모델이 동시에 로딩되면 서로의 메모리까지 포함하므로 모델 자체 크기로 계산
+                    size_bytes = model_memory_bytes(model)
+                    with self.lock:
+                        entry.model = model
+                        entry.size_bytes = size_bytes
+                        stats["loads"] += 1
+                        stats["load_sec"] += time.perf_counter() - started
+                        stats["size_bytes"] = entry.size_bytes
+                        self._evict()
+        except BaseException:
+            with self.lock:
+                entry.refs -= 1
+                if entry.model is None and entry.refs == 0:
+                    self.entries.pop(key, None)
+            raise
+        return entry
+
+    # self.lock을 잡은 상태에서 호출
+    def _evict(self, reserve: int = 0):
+        total = sum(e.size_bytes for e in self.entries.values())
+        for key, entry in list(self.entries.items()):
+            if total + reserve <= self.budget_bytes:
+                break
+            if entry.refs > 0 or entry.model is None:
+                continue
+            logger.info("모델 메모리 예산 초과로 %s 해제 (%.0fMB)", key, entry.size_bytes / 1024 / 1024)
+            del self.entries[key]
+            total -= entry.size_bytes
+            self.stats[key]["evictions"] += 1
+            entry.model = None
+        else:
+            if total + reserve > self.budget_bytes:
+                logger.warning("사용 중인 모델만으로 메모리 예산(%.0fMB)을 넘었습니다: %.0fMB",
+                               self.budget_bytes / 1024 / 1024, (total + reserve) / 1024 / 1024)
+            return
+        release_freed_memory()
+
+    def snapshot(self) -> list:
+        with self.lock:
+            rows = []
+            for key, stats in self.stats.items():
+                entry = self.entries.get(key)
+                resident = entry is not None and entry.model is not None
+                requests = stats["hits"] + stats["misses"]
+                rows.append({
+                    "model": key,
+                    "resident": resident,
+                    "size_bytes": entry.size_bytes if resident else 0,
+                    "refs": entry.refs if entry is not None else 0,
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "hit_rate": stats["hits"] / requests if requests else 0.0,
+                    "loads": stats["loads"],
+                    "evictions": stats["evictions"],
+                    "load_sec": stats["load_sec"],
+                    "last_used": entry.last_used if entry is not None else None,
+                })
+            return rows
+
+    # Prometheus 텍스트 형식
+    def render_prometheus(self) -> str:
+        rows = self.snapshot()
+        lines = [
+            "# HELP sung2158_model_memory_budget_bytes Memory budget for resident models",
+            "# TYPE sung2158_model_memory_budget_bytes gauge",
+            f"sung2158_model_memory_budget_bytes {self.budget_bytes}",
+        ]
+        for metric, key, metric_type, help_text in (
+            ("sung2158_model_resident", "resident", "gauge", "Whether the model is currently loaded"),
+            ("sung2158_model_memory_bytes", "size_bytes", "gauge", "Estimated memory used by the resident model"),
+            ("sung2158_model_in_use", "refs", "gauge", "In-flight requests holding the model"),
+            ("sung2158_model_hits_total", "hits", "counter", "Requests served by an already loaded model"),
+            ("sung2158_model_misses_total", "misses", "counter", "Requests that had to wait for a load"),
+            ("sung2158_model_evictions_total", "evictions", "counter", "Times the model was unloaded to stay within budget"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for row in rows:
+                lines.append(f'{metric}{{model="{row["model"]}"}} {int(row[key])}')
+        return "\n".join(lines) + "\n"
 
 @st.cache_resource(show_spinner=False)
-def load_whisper_model():
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry(MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+# 모델 메모리 크기: PyTorch 모델은 파라미터/버퍼(동적 양자화된 가중치 포함) 크기 합,
+# ONNX·CTranslate2 모델처럼 텐서로 드러나지 않으면 메모리에 그대로 올라가는 가중치 파일 크기
+def model_memory_bytes(model) -> int:
+    module = getattr(model, "model", model)  # 파이프라인, faster-whisper 어댑터
+    weights_path = getattr(model, "model_dir", None) or getattr(module, "model_path", None)
+    if weights_path:
+        return weights_file_bytes(str(weights_path))
+    try:
+        import torch
+    except ImportError:
+        return 0
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    tensors = list(module.parameters()) + list(module.buffers())
+    # 동적 양자화된 Linear는 가중치를 파라미터가 아닌 묶음(packed params)으로 가지므로 state_dict에서 추가로 셈
+    for value in module.state_dict().values():
+        tensors.extend(v for v in (value if isinstance(value, tuple) else (value,)) if isinstance(v, torch.Tensor))
+    seen = set()
+    total = 0
+    for tensor in tensors:
+        key = (tensor.data_ptr(), tensor.numel(), tensor.dtype)
+        if key not in seen:
+            seen.add(key)
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+def weights_file_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def release_freed_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass
+
+def bundled_emotion_model_dir(model_name: str, bundle_dir: str = MODEL_BUNDLE_DIR) -> str:
+    return os.path.join(bundle_dir, "emotion", model_name.replace("/", "--"))
+
+def bundled_whisper_model_dir(model_name: str, bundle_dir: str = MODEL_BUNDLE_DIR) -> str:
+    return os.path.join(bundle_dir, "whisper", model_name)
+
+def bundled_faster_whisper_dir(model_name: str, bundle_dir: str = MODEL_BUNDLE_DIR) -> str:
+    return os.path.join(bundle_dir, "faster-whisper", model_name)
+
+# 번들에 들어 있으면 로컬 경로, 없으면 허브 모델 이름
+def emotion_model_source(model_name: str) -> str:
+    if MODEL_BUNDLE_DIR and os.path.exists(os.path.join(bundled_emotion_model_dir(model_name), "config.json")):
+        return bundled_emotion_model_dir(model_name)
+    return model_name
+
+def build_emotion_pipeline(backend: str = "torch", model_name: str = EMOTION_MODEL_NAME):
+    from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+    source = emotion_model_source(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    if backend in ("onnx", "onnx-int8"):
+        model = load_onnx_emotion_model(quantized=backend == "onnx-int8", model_name=model_name)
+    elif backend in ("torch", "int8"):
+        model = AutoModelForSequenceClassification.from_pretrained(source)
+        if backend == "int8":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        raise ValueError(f"지원하지 않는 감정 분석 백엔드입니다: {backend}")
+    return pipeline("text-classification", model=model, tokenizer=tokenizer, return_all_scores=True)
+
+# ONNX 변환/양자화 결과는 MODEL_CACHE_DIR에 저장해 두고 다음 실행부터 재사용
+def load_onnx_emotion_model(quantized: bool = False, model_name: str = EMOTION_MODEL_NAME):
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError as e:
+        raise ImportError("ONNX 백엔드를 사용하려면 'optimum[onnxruntime]' 패키지가 필요합니다.") from e
+
+    export_dir = os.path.join(MODEL_CACHE_DIR, "onnx", model_name.replace("/", "--"))
+    if not os.path.exists(os.path.join(export_dir, "model.onnx")):
+        ORTModelForSequenceClassification.from_pretrained(emotion_model_source(model_name), export=True).save_pretrained(export_dir)
+    if not quantized:
+        return ORTModelForSequenceClassification.from_pretrained(export_dir)
+
+    quantized_dir = export_dir + "-int8"
+    if not os.path.exists(os.path.join(quantized_dir, "model_quantized.onnx")):
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        quantizer.quantize(save_dir=quantized_dir, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+    return ORTModelForSequenceClassification.from_pretrained(quantized_dir, file_name="model_quantized.onnx")
+
+def emotion_model_key(language: str) -> str:
+    return f"emotion:{EMOTION_MODELS[language]}:{EMOTION_BACKEND}"
+
+# 미리 로딩 (모델을 쓸 때는 use_emotion_model로 참조를 잡음)
+def load_emotion_model(language: str = "en"):
+    get_model_registry().preload(emotion_model_key(language), functools.partial(build_checked_emotion_model, language))
+
+# 토크나이저는 모델 가중치와 별개 객체라 참조를 놓은 뒤에 써도 모델 해제와 충돌하지 않음
+def load_emotion_tokenizer(language: str = "en"):
+    with use_emotion_model(language) as analyzer:
+        return analyzer.tokenizer
+
+# 추론하는 동안 모델이 해제되지 않도록 참조를 잡고 사용
+def use_emotion_model(language: str = "en"):
+    return get_model_registry().acquire(emotion_model_key(language), functools.partial(build_checked_emotion_model, language))
+
+# BACKEND_PARITY_CHECK=1이면 로딩할 때 기준 점수와 비교해 허용 범위를 넘는 백엔드는 쓰지 않고 PyTorch로 대체
+def build_checked_emotion_model(language: str = "en"):
+    model_name = EMOTION_MODELS[language]
+    analyzer = build_emotion_pipeline(EMOTION_BACKEND, model_name)
+    if EMOTION_BACKEND != "torch" and BACKEND_PARITY_CHECK:
+        parity = check_emotion_backend_parity(analyzer, model_name)
+        if not parity["passed"]:
+            logger.error("감정 분석 백엔드(%s, %s) 점수 차이가 허용 범위를 넘어 PyTorch 백엔드를 사용합니다: %.4f > %.4f",
+                         EMOTION_BACKEND, model_name, parity["max_abs_diff"], parity["tolerance"])
+            return build_emotion_pipeline("torch", model_name)
+    return analyzer
+
+# 백엔드 점수가 PyTorch fp32 기준 점수와 허용 오차 이내인지 확인 (benchmark.py --parity로도 실행)
+def check_emotion_backend_parity(analyzer, model_name: str = EMOTION_MODEL_NAME, texts: list = PARITY_SAMPLE_TEXTS,
+                                 tolerance: float = BACKEND_PARITY_TOLERANCE) -> dict:
+    reference = build_emotion_pipeline("torch", model_name)
+    reference_scores = [{r['label']: r['score'] for r in output} for output in reference(texts, truncation=True, max_length=EMOTION_MAX_LENGTH)]
+    candidate_scores = [{r['label']: r['score'] for r in output} for output in analyzer(texts, truncation=True, max_length=EMOTION_MAX_LENGTH)]
+    max_abs_diff = max(
+        abs(ref[label] - cand.get(label, 0))
+        for ref, cand in zip(reference_scores, candidate_scores)
+        for label in ref
+    )
+    return {"backend": EMOTION_BACKEND, "model": model_name, "max_abs_diff": max_abs_diff, "tolerance": tolerance,
+            "passed": max_abs_diff <= tolerance}
+
+# faster-whisper 결과를 openai-whisper의 transcribe() 반환 형식으로 맞춰 주는 어댑터
+class FasterWhisperAdapter:
+    def __init__(self, model, model_dir: str = None):
+        self.model = model
+        self.model_dir = model_dir  # 메모리 예산 계산용 (CTranslate2 가중치 파일 위치)
+
+    def transcribe(self, audio, fp16: bool = False, initial_prompt: str = None, language: str = None, **kwargs):
+        segments, info = self.model.transcribe(audio, initial_prompt=initial_prompt, language=language)
+        segments = [{"start": seg.start, "end": seg.end, "text": seg.text} for seg in segments]
+        return {"text": "".join(seg["text"] for seg in segments), "segments": segments, "language": info.language}
+
+def build_whisper_model(backend: str = "torch", model_name: str = WHISPER_MODEL_NAME):
+    import torch
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    # fp16 비활성화 (CPU 환경에서 안정성 향상)
-    return whisper.load_model("small", device=device)
-whisper_model = load_whisper_model()
+    if backend == "faster":
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError("faster 백엔드를 사용하려면 'faster-whisper' 패키지가 필요합니다.") from e
+        compute_type = "int8_float16" if device == "cuda" else "int8"
+        source = bundled_faster_whisper_dir(model_name)
+        if not (MODEL_BUNDLE_DIR and os.path.exists(os.path.join(source, "model.bin"))):
+            # 내려받은 위치를 알아야 가중치 크기를 셀 수 있으므로 경로로 바꿔서 넘김 (이미 받은 모델은 다시 받지 않음)
+            from faster_whisper import download_model
+            source = download_model(model_name, cache_dir=os.path.join(MODEL_CACHE_DIR, "faster-whisper"))
+        return FasterWhisperAdapter(WhisperModel(source, device=device, compute_type=compute_type), model_dir=source)
+
+    if backend == "torch":
+        # fp16 비활성화 (CPU 환경에서 안정성 향상)
+        return load_openai_whisper(model_name, device=device)
+    if backend == "int8":
+        model = load_openai_whisper(model_name, device="cpu")
+        # whisper의 Linear 하위 클래스는 동적 양자화 대상에서 빠지므로 nn.Linear로 바꾼 뒤 양자화
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    raise ValueError(f"지원하지 않는 Whisper 백엔드입니다: {backend}")
+
+def load_openai_whisper(model_name: str, device: str = "cpu"):
+    directory = bundled_whisper_model_dir(model_name)
+    if MODEL_BUNDLE_DIR and os.path.exists(os.path.join(directory, "model.safetensors")):
+        return load_bundled_whisper(directory, model_name, device)
+    import whisper
+    return whisper.load_model(model_name, device=device)
+
+# 번들의 safetensors 가중치를 mmap으로 열어 그대로 모델 파라미터로 사용 (무작위 초기화와 복사 생략, 페이지 캐시에서 필요할 때 읽음)
+def load_bundled_whisper(directory: str, model_name: str, device: str = "cpu"):
+    import torch
+    import whisper
+    from safetensors.torch import load_file
+
+    with open(os.path.join(directory, "dims.json"), encoding="utf-8") as f:
+        dims = whisper.model.ModelDimensions(**json.load(f))
+    # Whisper 생성자는 정렬 헤드를 sparse 텐서로 만드는데 meta 텐서에서는 지원되지 않을 수 있으므로,
+    # 인코더/디코더만 meta 장치에서 만들고 (가중치 메모리 할당 없음) 모델 본체와 버퍼는 일반 장치에서 구성
+    model = whisper.model.Whisper.__new__(whisper.model.Whisper)
+    torch.nn.Module.__init__(model)
+    model.dims = dims
+    with torch.device("meta"):
+        model.encoder = whisper.model.AudioEncoder(dims.n_mels, dims.n_audio_ctx, dims.n_audio_state, dims.n_audio_head, dims.n_audio_layer)
+        model.decoder = whisper.model.TextDecoder(dims.n_vocab, dims.n_text_ctx, dims.n_text_state, dims.n_text_head, dims.n_text_layer)
+    # assign=True(torch 2.1 이상)로 meta 파라미터를 mmap된 텐서로 바로 교체
+    model.load_state_dict(load_file(os.path.join(directory, "model.safetensors")), assign=True)
+
+    # state_dict에 저장되지 않는 버퍼(디코더 마스크, 정렬 헤드)는 Whisper 생성자와 같은 방식으로 meta 밖에서 다시 만듦
+    model.decoder.register_buffer("mask", torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-np.inf).triu_(1), persistent=False)
+    all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    all_heads[dims.n_text_layer // 2:] = True
+    model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+    if model_name in getattr(whisper, "_ALIGNMENT_HEADS", {}):
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_name])
+
+    missing = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers()) if tensor.is_meta]
+    if missing:
+        raise RuntimeError(f"번들의 Whisper 가중치에 없는 항목이 있습니다: {', '.join(missing[:5])}")
+    return model.to(device)
+
+# BACKEND_PARITY_CHECK=1이고 WHISPER_PARITY_AUDIO가 있으면 로딩할 때 PyTorch 결과와 비교해 기준 미달 백엔드는 PyTorch로 대체
+def build_checked_whisper_model(model_name: str = WHISPER_MODEL_NAME):
+    model = build_whisper_model(WHISPER_BACKEND, model_name)
+    if WHISPER_BACKEND == "torch" or not BACKEND_PARITY_CHECK:
+        return model
+    if not WHISPER_PARITY_AUDIO:
+        logger.warning("WHISPER_PARITY_AUDIO가 지정되지 않아 Whisper 백엔드(%s) 확인을 건너뜁니다.", WHISPER_BACKEND)
+        return model
+    with open(WHISPER_PARITY_AUDIO, "rb") as f:
+        audio = decode_audio_bytes(f.read(), os.path.splitext(WHISPER_PARITY_AUDIO)[1].lower())
+    parity = check_whisper_backend_parity(audio, model_name, model=model)
+    if not parity["passed"]:
+        logger.error("Whisper 백엔드(%s, %s) 인식 결과 일치도가 기준에 못 미쳐 PyTorch 백엔드를 사용합니다: %.3f < %.3f",
+                     WHISPER_BACKEND, model_name, parity["similarity"], parity["min_similarity"])
+        del model
+        release_freed_memory()
+        return build_whisper_model("torch", model_name)
+    return model
+
+def whisper_model_key(model_name: str) -> str:
+    return f"whisper:{model_name}:{WHISPER_BACKEND}"
+
+# 미리 로딩 (모델을 쓸 때는 pin_whisper_model/use_whisper_model로 참조를 잡음)
+def load_whisper_model(model_name: str = WHISPER_MODEL_NAME):
+    get_model_registry().preload(whisper_model_key(model_name), functools.partial(build_checked_whisper_model, model_name))
+
+# 참조만 잡아 두어 여러 번 나누어 추론하는 동안 모델이 해제되지 않게 함 (추론할 때는 whisper_model_lock 필요)
+def pin_whisper_model(model_name: str = WHISPER_MODEL_NAME):
+    loader = functools.partial(build_checked_whisper_model, model_name)
+    return get_model_registry().acquire(whisper_model_key(model_name), loader)
+
+# 같은 모델 객체를 여러 세션/스레드가 동시에 쓰면 디코딩 캐시가 섞이므로 모델별로 순차 실행
+@contextmanager
+def use_whisper_model(model_name: str = WHISPER_MODEL_NAME):
+    with pin_whisper_model(model_name) as model, whisper_model_lock(model_name):
+        yield model
+
+# 음성 인식 백엔드 결과가 PyTorch 결과와 얼마나 일치하는지 확인 (문자열 유사도, benchmark.py --parity --parity-audio로 실행)
+# model을 넘기면 레지스트리를 거치지 않고 그 모델과 비교 (로딩 중 확인용)
+def check_whisper_backend_parity(audio: np.ndarray, model_name: str = WHISPER_MODEL_NAME,
+                                 min_similarity: float = WHISPER_PARITY_MIN_SIMILARITY, model=None) -> dict:
+    reference = build_whisper_model("torch", model_name).transcribe(audio, fp16=False, language=WHISPER_LANGUAGE)["text"].strip()
+    if model is not None:
+        candidate = model.transcribe(audio, fp16=False, language=WHISPER_LANGUAGE)["text"].strip()
+    else:
+        with use_whisper_model(model_name) as model:
+            candidate = model.transcribe(audio, fp16=False, language=WHISPER_LANGUAGE)["text"].strip()
+    similarity = difflib.SequenceMatcher(None, reference, candidate).ratio()
+    return {"backend": WHISPER_BACKEND, "model": model_name, "similarity": similarity, "min_similarity": min_similarity,
+            "passed": similarity >= min_similarity}
+
+@st.cache_resource(show_spinner=False)
+def whisper_model_lock(model_name: str = WHISPER_MODEL_NAME):
+    return threading.Lock()
+
+# fast tokenizer는 여러 스레드에서 동시에 쓰면 잘라내기 설정이 충돌하므로 감정 모델도 순차 실행
+@st.cache_resource(show_spinner=False)
+def emotion_model_lock():
+    return threading.RLock()
+
+# 인증 후 음성 모델을 백그라운드에서 미리 로딩 (프로세스당 한 번만 실행)
+@st.cache_resource(show_spinner=False)
+def prewarm_whisper_model():
+    thread = threading.Thread(target=load_whisper_model, name="whisper-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+# 분석 결과 디스크 캐시 (업로드 내용의 SHA-256 + 모델/옵션 기준, 용량 초과 시 가장 오래 사용하지 않은 항목부터 삭제)
+# 변환된 대화 내용이 들어가므로 디렉터리는 0700, 파일은 0600으로 만들고 보관 기간이 지난 항목은 사용하지 않고 삭제
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sung2158", "results"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+def result_cache_key(data: bytes, **options) -> str:
+    digest = hashlib.sha256(hashlib.sha256(data).digest())
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def result_cache_get(key: str):
+    path = os.path.join(RESULT_CACHE_DIR, key + ".json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        if not isinstance(entry, dict) or time.time() - entry.get("created_at", 0) > RESULT_CACHE_TTL_SECONDS:
+            os.remove(path)
+            return None
+        os.utime(path, None)  # 최근 사용 시각 갱신 (LRU 기준)
+    except (OSError, ValueError):
+        return None
+    return entry.get("value")
+
+def result_cache_put(key: str, value):
+    path = os.path.join(RESULT_CACHE_DIR, key + ".json")
+    tmp_path = None
+    try:
+        os.makedirs(RESULT_CACHE_DIR, mode=0o700, exist_ok=True)
+        os.chmod(RESULT_CACHE_DIR, 0o700)
+        # 같은 프로세스의 작업 스레드들이 같은 키를 동시에 저장해도 섞이지 않도록 임시 파일은 항상 새로 만듦 (mkstemp는 0600)
+        fd, tmp_path = tempfile.mkstemp(dir=RESULT_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        tmp_path = None
+        evict_result_cache()
+    except OSError:
+        # 캐시 저장 실패는 분석 결과에 영향을 주지 않음
+        pass
+    finally:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+def evict_result_cache(max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl: int = RESULT_CACHE_TTL_SECONDS):
+    entries = []
+    total = 0
+    expired_before = time.time() - ttl
+    for entry in os.scandir(RESULT_CACHE_DIR):
+        if not entry.name.endswith(".json"):
+            continue
+        stat = entry.stat()
+        # 보관 기간 동안 한 번도 쓰이지 않은 항목은 용량과 관계없이 삭제
+        if stat.st_mtime < expired_before:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
 
-# 텍스트 전처리
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+# 단계별 성능 계측 (실행 시간, CPU 시간, 토큰 수 등 카운터, 메모리 변화)
+METRICS_HISTORY_SIZE = 500
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))  # 0이면 Prometheus 엔드포인트 비활성
+metrics_logger = logging.getLogger(__name__ + ".metrics")
+
+_stage_counters = contextvars.ContextVar("stage_counters", default=None)
+_stage_collector = contextvars.ContextVar("stage_collector", default=None)
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+class StageMetrics:
+    def __init__(self, history_size: int = METRICS_HISTORY_SIZE):
+        self.lock = threading.Lock()
+        self.records = deque(maxlen=history_size)
+        self.totals = {}
+
+    def record(self, record: dict):
+        with self.lock:
+            self.records.append(record)
+            totals = self.totals.setdefault(record["stage"], {"calls": 0, "errors": 0, "wall_sec": 0.0, "cpu_sec": 0.0, "counters": {}})
+            totals["calls"] += 1
+            totals["errors"] += 1 if record["error"] else 0
+            totals["wall_sec"] += record["wall_sec"]
+            totals["cpu_sec"] += record["cpu_sec"]
+            for name, value in record["counters"].items():
+                totals["counters"][name] = totals["counters"].get(name, 0) + value
+
+    # Prometheus 텍스트 형식
+    def render_prometheus(self) -> str:
+        with self.lock:
+            totals = {stage: {**t, "counters": dict(t["counters"])} for stage, t in self.totals.items()}
+        lines = []
+        for metric, key, help_text in (
+            ("sung2158_stage_calls_total", "calls", "Number of stage executions"),
+            ("sung2158_stage_errors_total", "errors", "Number of stage executions that raised"),
+            ("sung2158_stage_wall_seconds_total", "wall_sec", "Wall-clock time spent in stage"),
+            ("sung2158_stage_cpu_seconds_total", "cpu_sec", "Process CPU time spent in stage"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for stage, t in sorted(totals.items()):
+                lines.append(f'{metric}{{stage="{stage}"}} {t[key]}')
+        lines.append("# HELP sung2158_stage_units_total Work units processed by stage (tokens, chars, audio seconds)")
+        lines.append("# TYPE sung2158_stage_units_total counter")
+        for stage, t in sorted(totals.items()):
+            for name, value in sorted(t["counters"].items()):
+                lines.append(f'sung2158_stage_units_total{{stage="{stage}",unit="{name}"}} {value}')
+        rss = current_rss_bytes()
+        if rss is not None:
+            lines.append("# HELP sung2158_process_resident_memory_bytes Resident memory size")
+            lines.append("# TYPE sung2158_process_resident_memory_bytes gauge")
+            lines.append(f"sung2158_process_resident_memory_bytes {rss}")
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource(show_spinner=False)
+def get_stage_metrics() -> StageMetrics:
+    return StageMetrics()
+
+# 계측 구간 (with 문 또는 instrumented 데코레이터로 사용). 자주 호출되는 단계는 measure_memory=False로 RSS 조회 생략
+@contextmanager
+def stage_timer(stage: str, measure_memory: bool = True):
+    counters = {}
+    token = _stage_counters.set(counters)
+    rss_before = current_rss_bytes() if measure_memory else None
+    wall_started = time.perf_counter()
+    # 모델 추론은 내부적으로 여러 스레드를 쓰므로 프로세스 CPU 시간 기준으로 기록
+    cpu_started = time.process_time()
+    error = None
+    try:
+        yield counters
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _stage_counters.reset(token)
+        rss_after = current_rss_bytes() if measure_memory else None
+        record = {
+            "stage": stage,
+            "timestamp": time.time(),
+            "wall_sec": time.perf_counter() - wall_started,
+            "cpu_sec": time.process_time() - cpu_started,
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "counters": counters,
+            "error": error,
+        }
+        get_stage_metrics().record(record)
+        collector = _stage_collector.get()
+        if collector is not None:
+            collector.append(record)
+        if metrics_logger.isEnabledFor(logging.INFO):
+            metrics_logger.info(json.dumps(record, ensure_ascii=False))
+
+def instrumented(stage: str, measure_memory: bool = True):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage, measure_memory):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def add_stage_counter(name: str, value):
+    counters = _stage_counters.get()
+    if counters is not None:
+        counters[name] = counters.get(name, 0) + value
+
+# 현재 실행(스크립트 실행 또는 백그라운드 작업) 중 기록된 계측 결과 수집
+@contextmanager
+def collect_stage_metrics():
+    records = []
+    token = _stage_collector.set(records)
+    try:
+        yield records
+    finally:
+        _stage_collector.reset(token)
+
+# 다른 스레드에서 실행할 함수에 현재 계측 컨텍스트를 넘겨 줌
+def with_current_context(func):
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+# 같은 단계는 한 줄로 합쳐 표시 (발화 단위로 여러 번 호출되는 단계 등)
+def render_diagnostics(records: list):
+    if not records:
+        return
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record["stage"], {"calls": 0, "wall_sec": 0.0, "cpu_sec": 0.0, "rss_delta_bytes": None, "counters": {}})
+        entry["calls"] += 1
+        entry["wall_sec"] += record["wall_sec"]
+        entry["cpu_sec"] += record["cpu_sec"]
+        if record["rss_delta_bytes"] is not None:
+            entry["rss_delta_bytes"] = (entry["rss_delta_bytes"] or 0) + record["rss_delta_bytes"]
+        for name, value in record["counters"].items():
+            entry["counters"][name] = entry["counters"].get(name, 0) + value
+
+    with st.expander("🔧 진단 정보 (단계별 처리 시간)"):
+        rows = ["| 단계 | 호출 수 | 실행 시간(ms) | CPU 시간(ms) | 메모리 변화(MB) | 처리량 |", "|---|---|---|---|---|---|"]
+        for stage, entry in summary.items():
+            memory = f"{entry['rss_delta_bytes'] / 1024 / 1024:+.1f}" if entry["rss_delta_bytes"] is not None else "-"
+            counters = ", ".join(f"{name} {value:,.1f}" if isinstance(value, float) else f"{name} {value:,}"
+                                 for name, value in entry["counters"].items()) or "-"
+            rows.append(f"| {stage} | {entry['calls']} | {entry['wall_sec'] * 1000:,.1f} | {entry['cpu_sec'] * 1000:,.1f} | {memory} | {counters} |")
+        st.markdown("\n".join(rows))
+        st.download_button("계측 결과 내려받기 (JSON)", json.dumps(records, ensure_ascii=False, indent=2),
+                           file_name="diagnostics.json", mime="application/json", key=f"diagnostics_{id(records)}")
+
+# 현재 프로세스에 올라와 있는 모델과 메모리 사용량, 적중률
+def render_model_status(registry: ModelRegistry):
+    rows = registry.snapshot()
+    if not rows:
+        return
+    resident_bytes = sum(row["size_bytes"] for row in rows)
+    with st.expander(f"🧠 모델 메모리 현황 ({resident_bytes / 1024 / 1024:,.0f}MB / {registry.budget_bytes / 1024 / 1024:,.0f}MB)"):
+        table = ["| 모델 | 상태 | 메모리(MB) | 사용 중 | 적중률 | 로딩 횟수 | 해제 횟수 |", "|---|---|---|---|---|---|---|"]
+        for row in rows:
+            status = "상주" if row["resident"] else "해제됨"
+            table.append(f"| {row['model']} | {status} | {row['size_bytes'] / 1024 / 1024:,.0f} | {row['refs']} | "
+                         f"{row['hit_rate'] * 100:.0f}% | {row['loads']} | {row['evictions']} |")
+        st.markdown("\n".join(table))
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = (get_stage_metrics().render_prometheus() + get_model_registry().render_prometheus()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Streamlit은 별도 HTTP 경로를 추가할 수 없으므로 METRICS_PORT에 /metrics 전용 서버를 띄움 (프로세스당 한 번)
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(port: int = METRICS_PORT):
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+# 텍스트 정규화 패턴 (모듈 로딩 시 한 번만 컴파일)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DISALLOWED_CHARS_PATTERN = re.compile(r"[^가-힣a-zA-Z0-9.,!? ]")
+PERSON_NAME_PATTERN = re.compile(r"([가-힣a-zA-Z0-9_]{1,20}):")
+SPEAKER_LINE_PATTERN = re.compile(r"^\s*([가-힣a-zA-Z0-9_]{1,20})\s*:\s*(.*)$")
+UNKNOWN_SPEAKER = "화자 미상"
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?])\s+")
+HANGUL_PATTERN = re.compile(r"[가-힣]")
+LATIN_PATTERN = re.compile(r"[a-zA-Z]")
+
+# 텍스트 전처리 (줄바꿈 포함 모든 공백을 한 칸으로 합친 뒤 허용 문자만 남김)
+@instrumented("clean_text", measure_memory=False)
 def clean_text(text: str) -> str:
-    text = text.strip().replace("\n", " ").replace("\r", " ")
-    text = re.sub(r"\s+", " ", text)
-    text = re.sub(r"[^가-힣a-zA-Z0-9.,!? ]", "", text)
+    text = WHITESPACE_PATTERN.sub(" ", text.strip())
+    text = DISALLOWED_CHARS_PATTERN.sub("", text)
+    add_stage_counter("chars", len(text))
     return text
 
+# 정규화 결과: 전처리된 텍스트, 등장 순서대로의 화자 이름, 원문 글자 수, 발화 구간(화자, cleaned 내 시작, 끝)
+class NormalizedText(NamedTuple):
+    cleaned: str
+    participants: list
+    char_count: int
+    utterances: list
+
+# 줄 단위 스트림을 한 번만 읽으며 전처리·화자 추출·발화 구간 분리를 함께 수행 (원문 전체를 메모리에 둘 필요 없음)
+@instrumented("normalize_text")
+def normalize_lines(lines) -> NormalizedText:
+    parts = []
+    position = 0
+    char_count = 0
+    participants = []
+    seen = set()
+    utterances = []
+    speaker = None
+    utterance_start = None
+    utterance_end = None
+
+    for line in lines:
+        char_count += len(line)
+        for name in PERSON_NAME_PATTERN.findall(line):
+            if name not in seen:
+                seen.add(name)
+                participants.append(name)
+
+        cleaned_line = DISALLOWED_CHARS_PATTERN.sub("", WHITESPACE_PATTERN.sub(" ", line.strip()))
+        match = SPEAKER_LINE_PATTERN.match(line)
+        if match and utterance_start is not None:
+            utterances.append((speaker or UNKNOWN_SPEAKER, utterance_start, utterance_end))
+            utterance_start = None
+        if not cleaned_line:
+            if match:
+                speaker = match.group(1)
+            continue
+
+        if parts:
+            position += 1  # 줄 사이 공백
+        line_start = position
+        parts.append(cleaned_line)
+        position += len(cleaned_line)
+
+        content_start = line_start
+        if match:
+            speaker = match.group(1)
+            content = DISALLOWED_CHARS_PATTERN.sub("", WHITESPACE_PATTERN.sub(" ", match.group(2).strip()))
+            content_start = position - len(content) if cleaned_line.endswith(content) else line_start
+            if not content:
+                continue
+        if utterance_start is None:
+            utterance_start = content_start
+        utterance_end = position
+
+    if utterance_start is not None:
+        utterances.append((speaker or UNKNOWN_SPEAKER, utterance_start, utterance_end))
+
+    cleaned = " ".join(parts)
+    add_stage_counter("chars", char_count)
+    return NormalizedText(cleaned, participants, char_count, utterances)
+
+def normalize_text(text: str) -> NormalizedText:
+    return normalize_lines(text.splitlines())
+
+# 긴 대화 분할 분석 설정 (토큰 슬라이딩 윈도우)
+EMOTION_MAX_LENGTH = 512
+EMOTION_WINDOW_TOKENS = EMOTION_MAX_LENGTH - 2  # <s>, </s> 특수 토큰 자리 제외
+EMOTION_WINDOW_OVERLAP = 64
+EMOTION_BATCH_SIZE = 8
+# 감정 분석 결과 캐시 키에 들어가는 모델/분할 설정
+EMOTION_CACHE_OPTIONS = {
+    "model": EMOTION_MODEL_NAME,
+    "backend": EMOTION_BACKEND,
+    "window_tokens": EMOTION_WINDOW_TOKENS,
+    "overlap": EMOTION_WINDOW_OVERLAP,
+    "korean_model": KOREAN_EMOTION_MODEL_NAME if EMOTION_LANGUAGE_ROUTING else None,
+    "korean_label_map": KOREAN_EMOTION_LABEL_MAP if EMOTION_LANGUAGE_ROUTING else None,
+    "scoring_version": 2,  # 라벨 체계별 판정 기준 도입 (이전 캐시 결과는 사용하지 않음)
+}
+
+# 토큰 기준 겹치는 구간으로 분할 (원문 문자 범위를 그대로 잘라 사용)
+@instrumented("tokenize", measure_memory=False)
+def split_token_windows(text: str, tokenizer, window_tokens: int = EMOTION_WINDOW_TOKENS, overlap: int = EMOTION_WINDOW_OVERLAP) -> list:
+    with emotion_model_lock():
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    add_stage_counter("tokens", len(offsets))
+    if len(offsets) <= window_tokens:
+        return [(text, len(offsets))]
+
+    step = max(1, window_tokens - overlap)
+    windows = []
+    for start in range(0, len(offsets), step):
+        end = min(start + window_tokens, len(offsets))
+        windows.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+        if end == len(offsets):
+            break
+    return windows
+
+# 여러 텍스트를 배치 단위로 감정 분석 (language 모델로 분석하고 영어 모델 라벨 기준 점수로 반환)
+@instrumented("emotion_classifier")
+def score_texts_batched(texts: list, batch_size: int = EMOTION_BATCH_SIZE, language: str = "en") -> list:
+    if not texts:
+        return []
+    # 길이순으로 정렬해 배치 내 패딩을 줄인 뒤 원래 순서로 되돌림
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    with use_emotion_model(language) as analyzer, emotion_model_lock():
+        outputs = analyzer([texts[i] for i in order], batch_size=batch_size, truncation=True, max_length=EMOTION_MAX_LENGTH)
+    add_stage_counter("texts", len(texts))
+    add_stage_counter(f"texts_{language}", len(texts))
+    scores = [None] * len(texts)
+    for i, output in zip(order, outputs):
+        scores[i] = {r['label']: r['score'] for r in output}
+        if language != "en":
+            scores[i] = map_emotion_labels(scores[i])
+    return scores
+
+# 다국어 모델 라벨을 영어 모델 라벨 이름으로 옮김 (모델이 내지 않는 라벨은 만들지 않고, 재정규화하지 않음)
+def map_emotion_labels(scores: dict, label_map: dict = KOREAN_EMOTION_LABEL_MAP) -> dict:
+    mapped = {}
+    for label, score in scores.items():
+        target = label_map.get(label)
+        if target:
+            mapped[target] = mapped.get(target, 0.0) + score
+    return mapped
+
+# 한글/영문 글자 비율로 언어 판별 (글자가 너무 적으면 None)
+KOREAN_TEXT_RATIO = 0.3
+
+def detect_text_language(text: str):
+    hangul = len(HANGUL_PATTERN.findall(text))
+    latin = len(LATIN_PATTERN.findall(text))
+    if hangul + latin < 5:
+        return None
+    return "ko" if hangul / (hangul + latin) >= KOREAN_TEXT_RATIO else "en"
+
+# 언어별 연속 구간으로 분할 [(언어, 텍스트)] — 한 언어로만 된 입력은 통째로, 섞인 입력은 문장 단위로 판별
+def split_language_runs(text: str) -> list:
+    if not EMOTION_LANGUAGE_ROUTING:
+        return [("en", text)]
+    language = detect_text_language(text) or "en"
+    if not (HANGUL_PATTERN.search(text) and LATIN_PATTERN.search(text)):
+        return [(language, text)]
+
+    runs = []
+    for sentence in SENTENCE_BOUNDARY_PATTERN.split(text):
+        # 짧은 문장(감탄사, 이모티콘 등)은 앞 문장 언어를 따름
+        sentence_language = detect_text_language(sentence) or (runs[-1][0] if runs else language)
+        if runs and runs[-1][0] == sentence_language:
+            runs[-1][1].append(sentence)
+        else:
+            runs.append((sentence_language, [sentence]))
+    return [(run_language, " ".join(sentences)) for run_language, sentences in runs]
+
+# 구간별 점수 집계 (길이 가중 평균 + 구간별 최댓값, 라벨마다 그 라벨을 낸 구간끼리만 평균)
+def aggregate_window_scores(window_scores: list, weights: list) -> tuple:
+    weights = [max(w, 1) for w in weights]
+    weighted_sums = {}
+    label_weights = {}
+    peak_scores = {}
+    for scores, weight in zip(window_scores, weights):
+        for label, score in scores.items():
+            weighted_sums[label] = weighted_sums.get(label, 0) + score * weight
+            label_weights[label] = label_weights.get(label, 0) + weight
+            peak_scores[label] = max(peak_scores.get(label, 0), score)
+    mean_scores = {label: weighted_sums[label] / label_weights[label] for label in weighted_sums}
+    return mean_scores, peak_scores
+
+# 감정 라벨 체계: 영어 모델처럼 7개 라벨을 모두 내는 점수(full)와 일부 라벨만 내는 다국어 모델 점수(partial)
+# 라벨 수가 적으면 같은 대화라도 각 라벨 점수가 높게 나오므로 판정 기준을 따로 둠
+# (partial 기준은 라벨 4개 모델의 균등 분포 0.25가 7개 라벨의 약 0.14에 대응하도록 full 기준을 약 1.75배로 맞춘 값)
+LABEL_SCHEME_FULL = "full"
+LABEL_SCHEME_PARTIAL = "partial"
+EMOTION_THRESHOLDS = {
+    LABEL_SCHEME_FULL: {"danger_sadness": 0.45, "danger_pair": 0.3, "concern_sadness": 0.25, "concern_fear": 0.2,
+                        "negative_sadness": 0.3, "negative_fear": 0.2, "positive": 0.5, "calm": 0.3, "baseline": 0.0},
+    LABEL_SCHEME_PARTIAL: {"danger_sadness": 0.75, "danger_pair": 0.5, "concern_sadness": 0.45, "concern_fear": 0.35,
+                           "negative_sadness": 0.5, "negative_fear": 0.35, "positive": 0.65, "calm": 0.45, "baseline": 0.25},
+}
+
+# 구간 가중치 기준으로 더 많은 부분을 차지한 라벨 체계
+def label_scheme(window_scores: list, weights: list) -> str:
+    full = sum(max(w, 1) for scores, w in zip(window_scores, weights) if set(EMOTION_LABELS) <= set(scores))
+    partial = sum(max(w, 1) for scores, w in zip(window_scores, weights)) - full
+    return LABEL_SCHEME_PARTIAL if partial > full else LABEL_SCHEME_FULL
+
 # 자살 위험 판단
-def detect_suicide_risk(emotion_scores: dict, conversation_length: int) -> str:
+def detect_suicide_risk(emotion_scores: dict, conversation_length: int, scheme: str = LABEL_SCHEME_FULL) -> str:
     sadness = emotion_scores.get('sadness', 0)
     fear = emotion_scores.get('fear', 0)
+    thresholds = EMOTION_THRESHOLDS[scheme]
     
     if conversation_length < 50:
         return "정보 부족"
 
-    if sadness > 0.45 or (sadness > 0.3 and fear > 0.3):
+    if sadness > thresholds["danger_sadness"] or (sadness > thresholds["danger_pair"] and fear > thresholds["danger_pair"]):
         return "⚠️ 위험 신호 감지"
-    elif sadness > 0.25 or fear > 0.2:
+    elif sadness > thresholds["concern_sadness"] or fear > thresholds["concern_fear"]:
         return "❗️ 관심 필요"
     else:
         return "✅ 위험 신호 없음"
 
 # 조직 적응력 세부 항목
-def detailed_organization_evaluation(emotion_scores: dict) -> dict:
-    discipline_score = emotion_scores.get('neutral', 0) + (1 - emotion_scores.get('anger', 0))
+def detailed_organization_evaluation(emotion_scores: dict, scheme: str = LABEL_SCHEME_FULL) -> dict:
+    if scheme == LABEL_SCHEME_PARTIAL:
+        # 중립 라벨이 없으므로 규율성은 분노만으로, 슬픔·두려움은 균등 분포 기준선을 넘는 만큼만 반영
+        baseline = EMOTION_THRESHOLDS[scheme]["baseline"]
+        discipline_score = 2 * (1 - emotion_scores.get('anger', 0))
+        stress_resilience_score = 2 - 2 * (max(0, emotion_scores.get('sadness', 0) - baseline) + max(0, emotion_scores.get('fear', 0) - baseline))
+    else:
+        discipline_score = emotion_scores.get('neutral', 0) + (1 - emotion_scores.get('anger', 0))
+        stress_resilience_score = (1 - emotion_scores.get('sadness', 0)) + (1 - emotion_scores.get('fear', 0))
     loyalty_score = emotion_scores.get('joy', 0) + emotion_scores.get('love', 0)
-    stress_resilience_score = (1 - emotion_scores.get('sadness', 0)) + (1 - emotion_scores.get('fear', 0))
 
     discipline = min(1, max(0, discipline_score / 2))
     loyalty = min(1, max(0, loyalty_score / 2))
@@ -68,7 +1012,8 @@ def detailed_organization_evaluation(emotion_scores: dict) -> dict:
     }
 
 # 심층 심리 및 성격 보고서 생성 함수
-def generate_detailed_personality_report(emotion_scores: dict, participants: list, conversation_length: int) -> str:
+def generate_detailed_personality_report(emotion_scores: dict, participants: list, conversation_length: int,
+                                         scheme: str = LABEL_SCHEME_FULL) -> str:
     participants_str = ", ".join(participants) if participants else "분석 대상자"
     
     if conversation_length < 50:
@@ -89,6 +1034,9 @@ def generate_detailed_personality_report(emotion_scores: dict, participants: lis
     neutral = emotion_scores.get('neutral', 0)
     
     dominant_emotion = max(emotion_scores, key=emotion_scores.get)
+    thresholds = EMOTION_THRESHOLDS[scheme]
+    negative = sadness > thresholds["negative_sadness"] or fear > thresholds["negative_fear"]
+    calm = anger < thresholds["calm"] and disgust < thresholds["calm"]
     emotion_korean_map = {
         'joy': '기쁨', 'sadness': '슬픔', 'anger': '분노', 'fear': '두려움',
         'love': '사랑', 'surprise': '놀람', 'disgust': '혐오', 'neutral': '중립'
@@ -107,9 +1055,9 @@ def generate_detailed_personality_report(emotion_scores: dict, participants: lis
 
 ### 📝 심리 및 무의식 분석
 - **심리 상태**:
-    - **긍정 정서**: 대화에서 기쁨({joy:.2f})과 사랑({love:.2f}) 같은 긍정적 감정이 두드러져, 전반적으로 {'활발하고 긍정적인 성향' if (joy+love) > 0.5 else '내성적이거나 감정 표현에 신중한 경향'}을 보입니다.
-    - **부정 정서**: 슬픔({sadness:.2f})과 두려움({fear:.2f})이 다소 {'높아' if sadness > 0.3 or fear > 0.2 else '낮아'}, {'감정적으로 불안정하거나 스트레스 상황에 놓여 있을 가능성' if sadness > 0.3 or fear > 0.2 else '비교적 안정적인 심리 상태'}로 추정됩니다.
-    - **분노/혐오**: 분노({anger:.2f})나 혐오({disgust:.2f})는 {'낮은 편' if anger < 0.3 and disgust < 0.3 else '주의가 필요한 수준'}으로, {'평소 감정 조절이 잘 되고' if anger < 0.3 and disgust < 0.3 else '내적 갈등이나 불만을 내포하고 있을 수 있습니다.'}를 시사합니다.
+    - **긍정 정서**: 대화에서 기쁨({joy:.2f})과 사랑({love:.2f}) 같은 긍정적 감정이 두드러져, 전반적으로 {'활발하고 긍정적인 성향' if (joy+love) > thresholds["positive"] else '내성적이거나 감정 표현에 신중한 경향'}을 보입니다.
+    - **부정 정서**: 슬픔({sadness:.2f})과 두려움({fear:.2f})이 다소 {'높아' if negative else '낮아'}, {'감정적으로 불안정하거나 스트레스 상황에 놓여 있을 가능성' if negative else '비교적 안정적인 심리 상태'}로 추정됩니다.
+    - **분노/혐오**: 분노({anger:.2f})나 혐오({disgust:.2f})는 {'낮은 편' if calm else '주의가 필요한 수준'}으로, {'평소 감정 조절이 잘 되고' if calm else '내적 갈등이나 불만을 내포하고 있을 수 있습니다.'}를 시사합니다.
 - **무의식적 경향성**:
     - **관계성**: 대화의 긍정 정서가 높다면, 타인과의 상호작용에서 긍정적 관계를 형성하려는 무의식적 욕구가 강합니다. 반대로 두려움이 높다면 관계에서 오는 불안감이나 회피 경향이 무의식적으로 작용할 수 있습니다.
     - **자아 방어**: 분노나 혐오가 표출될 경우, 이는 외부 환경으로부터 자신을 보호하려는 무의식적 방어 기제로 해석될 수 있습니다. 감정의 과도한 억제는 스트레스의 무의식적 축적을 의미하기도 합니다.
@@ -118,7 +1066,17 @@ def generate_detailed_personality_report(emotion_scores: dict, participants: lis
     return report_text[:4000]
 
 # 최종 보고서 생성
+@instrumented("generate_final_report", measure_memory=False)
 def generate_final_report(results: dict, participants: list, cleaned_text: str) -> str:
+    return format_final_report(results, participants, len(cleaned_text))
+
+# 보고서에 표시할 감정 모델 (결과의 라벨 체계로 어느 모델의 점수가 주를 이루는지 판단)
+def emotion_model_description(scheme: str) -> str:
+    if scheme == LABEL_SCHEME_PARTIAL:
+        return f"영어는 DistilRoBERTa 기반, 한국어 등은 다국어 모델 {KOREAN_EMOTION_MODEL_NAME}"
+    return "DistilRoBERTa 기반"
+
+def format_final_report(results: dict, participants: list, conversation_length: int) -> str:
     emotion_scores = results["감정 비율"]
     org_eval = results["조직 적응력 세분화"]
     suicide_risk_status = results["자살 위험 여부"]
@@ -143,6 +1101,13 @@ def generate_final_report(results: dict, participants: list, cleaned_text: str)
     else:
         suicide_risk_reason = "대화 내용에 기반하여 특별한 위험 신호는 감지되지 않았습니다."
 
+    # 여러 구간으로 나누어 분석한 경우, 평균에 묻히는 구간별 최고치를 함께 표시
+    window_peak_note = ""
+    if results.get("분석 구간 수", 1) > 1:
+        peak_scores = results["구간별 최대 감정"]
+        window_peak_note = f"""
+- **구간별 최고치**: 총 {results['분석 구간 수']}개 구간 중 슬픔 최고 {peak_scores.get('sadness', 0):.2f}, 두려움 최고 {peak_scores.get('fear', 0):.2f}"""
+
     report = f"""
 # 📄 대화 내용 분석 리포트
 
@@ -150,7 +1115,7 @@ def generate_final_report(results: dict, participants: list, cleaned_text: str)
 
 ### 1. 자살 위험도 평가
 - **판정 결과**: **{suicide_risk_status}**
-- **근거**: {suicide_risk_reason} 단순 AI 분석이므로 전문가의 추가 상담이 반드시 필요합니다.
+- **근거**: {suicide_risk_reason} 단순 AI 분석이므로 전문가의 추가 상담이 반드시 필요합니다.{window_peak_note}
 
 ---
 
@@ -162,13 +1127,13 @@ def generate_final_report(results: dict, participants: list, cleaned_text: str)
 
 ---
 
-{generate_detailed_personality_report(emotion_scores, participants, len(cleaned_text))}
+{generate_detailed_personality_report(emotion_scores, participants, conversation_length, results.get("감정 라벨 기준", LABEL_SCHEME_FULL))}
 
 ---
 
 ### 📜 분석 관련 근거
 - **법률적 근거**: 본 분석은 비전문가용 참고 자료로, **정식 진단 및 법적 효력을 가지지 않습니다**. 개인정보보호법에 의거, 대상자의 동의 없이 무단으로 정보를 수집하거나 활용하는 것은 법적 제재의 대상이 될 수 있습니다. 모든 활용은 개인정보 보호 원칙을 철저히 준수해야 합니다.
-- **학술적 근거**: 본 분석은 **폴 에크만(Paul Ekman)의 보편적 기본 감정 이론**과 같은 심리학적 모델에 기반한 자연어 처리(NLP) 기술을 활용합니다. AI 모델(DistilRoBERTa 기반)이 텍스트의 문맥과 단어 패턴을 분석하여 감정을 식별하고, 이 데이터를 바탕으로 조직 행동 및 심리 이론에 따라 해석한 내용입니다.
+- **학술적 근거**: 본 분석은 **폴 에크만(Paul Ekman)의 보편적 기본 감정 이론**과 같은 심리학적 모델에 기반한 자연어 처리(NLP) 기술을 활용합니다. AI 모델({emotion_model_description(results.get("감정 라벨 기준", LABEL_SCHEME_FULL))})이 텍스트의 문맥과 단어 패턴을 분석하여 감정을 식별하고, 이 데이터를 바탕으로 조직 행동 및 심리 이론에 따라 해석한 내용입니다.
 
 ---
 
@@ -177,9 +1142,9 @@ def generate_final_report(results: dict, participants: list, cleaned_text: str)
     return report
 
 # 참여자 이름 추출
+@instrumented("extract_person_names", measure_memory=False)
 def extract_person_names(text: str) -> list:
-    pattern = re.compile(r"([가-힣a-zA-Z0-9_]{1,20}):")
-    matches = pattern.findall(text)
+    matches = PERSON_NAME_PATTERN.findall(text)
     seen = set()
     participants = []
     for m in matches:
@@ -188,49 +1153,965 @@ def extract_person_names(text: str) -> list:
             participants.append(m)
     return participants[:3]
 
+SPEAKER_BATCH_SIZE = 32
+
+# 화자별 감정 분석 (정규화 단계에서 나눈 발화 구간 전체를 한 번의 배치 호출로 분석)
+# score_cache를 넘기면 발화별 점수를 세션에 보관해 두고 바뀐 발화만 다시 추론
+def analyze_speakers(text, batch_size: int = SPEAKER_BATCH_SIZE, score_cache: OrderedDict = None) -> dict:
+    normalized = text if isinstance(text, NormalizedText) else normalize_text(text)
+    utterances = [(speaker, normalized.cleaned[start:end].strip()) for speaker, start, end in normalized.utterances]
+    utterances = [(speaker, utterance) for speaker, utterance in utterances if utterance]
+    # 이름 있는 화자 줄이 없으면 (예: 한 줄로 이어진 음성 변환 결과) 표로 보여줄 것이 없으므로 추론하지 않음
+    if not any(speaker != UNKNOWN_SPEAKER for speaker, _ in utterances):
+        return {}
+
+    # 전체 점수와 같은 언어별 모델로 분석 (한국어 발화는 다국어 모델)
+    utterance_texts = [u for _, u in utterances]
+    if score_cache is not None:
+        utterance_scores = score_cleaned_texts_cached(utterance_texts, score_cache, batch_size=batch_size)
+    else:
+        utterance_scores = score_cleaned_texts(utterance_texts, batch_size=batch_size)
+
+    grouped = {}
+    for (speaker, cleaned), (scores, weights) in zip(utterances, utterance_scores):
+        entry = grouped.setdefault(speaker, {"scores": [], "weights": [], "texts": []})
+        entry["scores"].extend(scores)
+        entry["weights"].extend(weights)
+        entry["texts"].append(cleaned)
+
+    speaker_results = {}
+    for speaker, entry in grouped.items():
+        emotion_scores, peak_scores = aggregate_window_scores(entry["scores"], entry["weights"])
+        results = build_emotion_results(emotion_scores, peak_scores, " ".join(entry["texts"]), len(entry["texts"]),
+                                        label_scheme(entry["scores"], entry["weights"]))
+        results["발화 수"] = len(entry["texts"])
+        speaker_results[speaker] = results
+    return speaker_results
+
+# 화자별 분석 결과 표 출력
+def render_speaker_profiles(speaker_results: dict):
+    if not any(speaker != UNKNOWN_SPEAKER for speaker in speaker_results):
+        return
+
+    rows = ["| 화자 | 발화 수 | 지배 감정 | 자살 위험 여부 | 규율성 | 충성심 | 스트레스 저항력 |",
+            "|---|---|---|---|---|---|---|"]
+    for speaker, results in speaker_results.items():
+        org_eval = results["조직 적응력 세분화"]
+        rows.append(
+            f"| {speaker} | {results['발화 수']} | {results['지배 감정']} | {results['자살 위험 여부']} "
+            f"| {org_eval['규율성']:.2f} | {org_eval['충성심']:.2f} | {org_eval['스트레스 저항력']:.2f} |"
+        )
+    st.markdown("### 👥 화자별 분석")
+    st.markdown("\n".join(rows))
+
 # 감정 분석
-def analyze_texts(texts: list) -> dict:
-    combined_text = " ".join(texts)
-    cleaned = clean_text(combined_text)
-    
-    if len(cleaned) < 10:
-        return {
-            "감정 비율": {},
-            "지배 감정": "정보 부족",
-            "자살 위험 여부": "정보 부족",
-            "조직 적응력 세분화": {"규율성": 0, "충성심": 0, "스트레스 저항력": 0}
-        }
+@instrumented("analyze_texts")
+def analyze_texts(texts: list, chunked: bool = True, batch_size: int = EMOTION_BATCH_SIZE, use_cache: bool = True, pre_cleaned: bool = False) -> dict:
+    return analyze_documents([" ".join(texts)], chunked=chunked, batch_size=batch_size, use_cache=use_cache, pre_cleaned=pre_cleaned)[0]
+
+# 여러 문서 일괄 감정 분석 (모든 문서의 구간을 모아 한 번의 배치 호출로 처리)
+# pre_cleaned=True면 normalize_lines 등으로 이미 전처리한 텍스트로 보고 다시 정리하지 않음
+def analyze_documents(documents: list, chunked: bool = True, batch_size: int = EMOTION_BATCH_SIZE, use_cache: bool = True, pre_cleaned: bool = False) -> list:
+    results = [None] * len(documents)
+    pending = []
+    for index, document in enumerate(documents):
+        cache_key = result_cache_key(
+            document.encode("utf-8"), kind="emotion-cleaned" if pre_cleaned else "emotion", chunked=chunked, **EMOTION_CACHE_OPTIONS
+        )
+        if use_cache:
+            cached = result_cache_get(cache_key)
+            if cached is not None:
+                # 디스크에는 대화 내용을 남기지 않으므로 보고서에 필요한 정리된 텍스트는 입력에서 다시 만듦
+                cached["cleaned_text"] = document if pre_cleaned else clean_text(document)
+                results[index] = cached
+                continue
+
+        cleaned = document if pre_cleaned else clean_text(document)
+        if len(cleaned) < 10:
+            results[index] = insufficient_results()
+            continue
+
+        pending.append((index, cache_key, cleaned))
+
+    scored = score_cleaned_texts([cleaned for *_, cleaned in pending], chunked=chunked, batch_size=batch_size)
+    for (index, cache_key, cleaned), (scores, weights) in zip(pending, scored):
+        emotion_scores, peak_scores = aggregate_window_scores(scores, weights)
+        results[index] = build_emotion_results(emotion_scores, peak_scores, cleaned, len(scores), label_scheme(scores, weights))
+        if use_cache:
+            result_cache_put(cache_key, {key: value for key, value in results[index].items() if key != "cleaned_text"})
+    return results
+
+# 전처리된 여러 텍스트의 구간을 모아 한 번에 배치 분석하고, 텍스트별 (구간별 점수, 구간별 토큰 수)로 나누어 반환
+# 언어별로 구간을 모아 모델마다 한 번씩 배치 호출
+def score_cleaned_texts(cleaned_texts: list, chunked: bool = True, batch_size: int = EMOTION_BATCH_SIZE) -> list:
+    tokenizers = {}
+    queues = {}  # 언어 → 분석할 구간 텍스트
+    layout = []  # 텍스트별 [(언어, 큐 안의 시작 위치, 구간 목록)]
+    for cleaned in cleaned_texts:
+        entries = []
+        for language, run in split_language_runs(cleaned):
+            # 512 토큰을 넘는 대화도 잘리지 않도록 겹치는 구간으로 나누어 분석 (chunked=False면 앞부분만 분석)
+            if chunked:
+                if language not in tokenizers:
+                    tokenizers[language] = load_emotion_tokenizer(language)
+                windows = split_token_windows(run, tokenizers[language])
+            else:
+                windows = [(run, 1)]
+            queue = queues.setdefault(language, [])
+            entries.append((language, len(queue), windows))
+            queue.extend(w[0] for w in windows)
+            add_stage_counter("tokens", sum(w[1] for w in windows))
+            add_stage_counter("windows", len(windows))
+        layout.append(entries)
+
+    queue_scores = {language: score_texts_batched(texts, batch_size=batch_size, language=language) for language, texts in queues.items()}
+    scored = []
+    for entries in layout:
+        scores = []
+        weights = []
+        for language, position, windows in entries:
+            scores.extend(queue_scores[language][position:position + len(windows)])
+            weights.extend(w[1] for w in windows)
+        scored.append((scores, weights))
+    return scored
+
+# 텍스트 하나를 구간 단위로 분석해 (구간별 점수, 구간별 토큰 수) 반환
+def score_text_windows(text: str, batch_size: int = EMOTION_BATCH_SIZE) -> tuple:
+    cleaned = clean_text(text)
+    if not cleaned:
+        return [], []
+    return score_cleaned_texts([cleaned], batch_size=batch_size)[0]
+
+# 부분별로 미리 분석해 둔 구간 점수를 합쳐 전체 결과 구성
+def combine_window_scores(cleaned: str, parts: list) -> dict:
+    window_scores = [score for scores, _ in parts for score in scores]
+    weights = [weight for _, part_weights in parts for weight in part_weights]
+    if len(cleaned) < 10 or not window_scores:
+        return insufficient_results()
+    emotion_scores, peak_scores = aggregate_window_scores(window_scores, weights)
+    return build_emotion_results(emotion_scores, peak_scores, cleaned, len(window_scores), label_scheme(window_scores, weights))
+
+def insufficient_results() -> dict:
+    return {
+        "감정 비율": {},
+        "지배 감정": "정보 부족",
+        "자살 위험 여부": "정보 부족",
+        "조직 적응력 세분화": {"규율성": 0, "충성심": 0, "스트레스 저항력": 0}
+    }
 
-    emotion_results = emotion_analyzer(cleaned, truncation=True, max_length=512)[0]
-    emotion_scores = {r['label']: r['score'] for r in emotion_results}
+# 분석 결과 딕셔너리 구성
+def build_emotion_results(emotion_scores: dict, peak_scores: dict, cleaned: str, window_count: int,
+                          scheme: str = LABEL_SCHEME_FULL) -> dict:
     dominant_emotion = max(emotion_scores, key=emotion_scores.get)
-    suicide_risk = detect_suicide_risk(emotion_scores, len(cleaned))
-    org_eval = detailed_organization_evaluation(emotion_scores)
-    
+    suicide_risk = detect_suicide_risk(emotion_scores, len(cleaned), scheme)
+    org_eval = detailed_organization_evaluation(emotion_scores, scheme)
+
     return {
         "감정 비율": emotion_scores,
+        "구간별 최대 감정": peak_scores,
+        "분석 구간 수": window_count,
         "지배 감정": dominant_emotion,
         "자살 위험 여부": suicide_risk,
         "조직 적응력 세분화": org_eval,
+        "감정 라벨 기준": scheme,
         "cleaned_text": cleaned
     }
 
-# Whisper STT
-def transcribe_audio(file_buffer) -> str:
+# 분석 결과 레코드 (표시용 문자열 대신 숫자 벡터와 열거형으로 보관, 버전이 다르면 읽지 않음)
+RESULT_RECORD_VERSION = 2
+ORG_EVAL_KEYS = ("규율성", "충성심", "스트레스 저항력")
+REPORT_CACHE_ENTRIES = 256
+RESULT_HISTORY_SIZE = 20
+
+class RiskLevel(IntEnum):
+    INSUFFICIENT = 0
+    NONE = 1
+    CONCERN = 2
+    DANGER = 3
+
+RISK_LABELS = {
+    RiskLevel.INSUFFICIENT: "정보 부족",
+    RiskLevel.NONE: "✅ 위험 신호 없음",
+    RiskLevel.CONCERN: "❗️ 관심 필요",
+    RiskLevel.DANGER: "⚠️ 위험 신호 감지",
+}
+RISK_LEVELS = {label: level for level, label in RISK_LABELS.items()}
+
+class ResultRecord(NamedTuple):
+    version: int
+    source: str
+    created_at: float
+    emotions: tuple  # EMOTION_LABELS 순서
+    peaks: tuple  # EMOTION_LABELS 순서
+    risk: int  # RiskLevel
+    org: tuple  # ORG_EVAL_KEYS 순서
+    char_count: int
+    window_count: int  # 0이면 대화가 너무 짧아 분석하지 않은 결과
+    participants: tuple
+    scheme: str  # 감정 라벨 체계 (모델이 내지 않은 라벨은 emotions/peaks에서 0)
+
+def build_result_record(results: dict, participants: list, source: str = "") -> ResultRecord:
+    emotion_scores = results["감정 비율"]
+    peak_scores = results.get("구간별 최대 감정", {})
+    org_eval = results["조직 적응력 세분화"]
+    return ResultRecord(
+        RESULT_RECORD_VERSION,
+        source,
+        round(time.time(), 3),
+        tuple(round(emotion_scores.get(label, 0.0), 4) for label in EMOTION_LABELS),
+        tuple(round(peak_scores.get(label, 0.0), 4) for label in EMOTION_LABELS),
+        int(RISK_LEVELS.get(results["자살 위험 여부"], RiskLevel.INSUFFICIENT)),
+        tuple(float(org_eval[key]) for key in ORG_EVAL_KEYS),
+        len(results.get("cleaned_text", "")),
+        results.get("분석 구간 수", 1) if "cleaned_text" in results else 0,
+        tuple(participants),
+        results.get("감정 라벨 기준", LABEL_SCHEME_FULL),
+    )
+
+# 보고서 생성 함수가 받는 결과 딕셔너리 형태로 되돌림
+def record_to_results(record: ResultRecord) -> dict:
+    emotion_scores = dict(zip(EMOTION_LABELS, record.emotions))
+    return {
+        "감정 비율": emotion_scores,
+        "구간별 최대 감정": dict(zip(EMOTION_LABELS, record.peaks)),
+        "분석 구간 수": record.window_count,
+        "지배 감정": max(emotion_scores, key=emotion_scores.get) if record.window_count else "정보 부족",
+        "자살 위험 여부": RISK_LABELS[RiskLevel(record.risk)],
+        "조직 적응력 세분화": dict(zip(ORG_EVAL_KEYS, record.org)),
+        "감정 라벨 기준": record.scheme,
+    }
+
+# orjson이 설치되어 있으면 사용하고, 없으면 표준 json (공백 없는 배열 형식)
+def dump_result_record(record: ResultRecord) -> bytes:
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return orjson.dumps(list(record))
+
+def load_result_record(data: bytes) -> ResultRecord:
+    try:
+        import orjson
+        values = orjson.loads(data)
+    except ImportError:
+        values = json.loads(data)
+    if values[0] != RESULT_RECORD_VERSION:
+        raise ValueError(f"지원하지 않는 결과 레코드 버전입니다: {values[0]}")
+    version, source, created_at, emotions, peaks, risk, org, char_count, window_count, participants, scheme = values
+    return ResultRecord(version, source, created_at, tuple(emotions), tuple(peaks), risk, tuple(org),
+                        char_count, window_count, tuple(participants), scheme)
+
+def format_record_report(record: ResultRecord) -> str:
+    if not record.window_count:
+        return "대화 내용이 너무 짧아 분석이 불가능합니다."
+    return format_final_report(record_to_results(record), list(record.participants), record.char_count)
+
+# 같은 내용의 보고서는 다시 만들지 않음 (재실행, 내려받기, 기록 비교)
+# 입력 이름과 생성 시각은 보고서에 쓰이지 않으므로 캐시 키에서 빼서 같은 입력을 다시 분석해도 캐시를 씀
+def render_report_markdown(record_bytes: bytes) -> str:
+    record = load_result_record(record_bytes)
+    return render_report_content(dump_result_record(record._replace(source="", created_at=0.0)))
+
+@st.cache_data(show_spinner=False, max_entries=REPORT_CACHE_ENTRIES)
+def render_report_content(content_bytes: bytes) -> str:
+    return format_record_report(load_result_record(content_bytes))
+
+def render_result_record(record_bytes: bytes, key: str):
+    report = render_report_markdown(record_bytes)
+    st.markdown("### 📄 분석 결과 보고서")
+    st.markdown(f'<div class="report">{report}</div>', unsafe_allow_html=True)
+    name = os.path.splitext(load_result_record(record_bytes).source)[0] or "report"
+    st.download_button("보고서 내려받기 (Markdown)", report, file_name=f"{name}.md", mime="text/markdown", key=f"{key}_md")
+    st.download_button("결과 내려받기 (JSON)", record_bytes, file_name=f"{name}.json", mime="application/json", key=f"{key}_json")
+    remember_result_record(record_bytes)
+
+# 이번 세션에서 분석한 결과 기록 (레코드만 보관하고 비교 표는 숫자 벡터로 계산)
+def remember_result_record(record_bytes: bytes):
+    history = st.session_state.setdefault("result_history", [])
+    if record_bytes not in history:
+        history.append(record_bytes)
+        del history[:-RESULT_HISTORY_SIZE]
+
+def render_result_history():
+    history = st.session_state.get("result_history", [])
+    if len(history) < 2:
+        return
+    with st.expander(f"📚 이번 세션 분석 기록 비교 ({len(history)}건)"):
+        rows = ["| 시각 | 입력 | 자살 위험 여부 | 슬픔 | 두려움 | 조직 적응도 | 직전 대비 |", "|---|---|---|---|---|---|---|"]
+        previous = None
+        for record in map(load_result_record, history):
+            emotions = dict(zip(EMOTION_LABELS, record.emotions))
+            adaptation = sum(record.org) / len(record.org)
+            change = f"{adaptation - previous:+.2f}" if previous is not None else "-"
+            previous = adaptation
+            rows.append(f"| {time.strftime('%H:%M:%S', time.localtime(record.created_at))} | {record.source or '-'} | "
+                        f"{RISK_LABELS[RiskLevel(record.risk)]} | {emotions['sadness']:.2f} | {emotions['fear']:.2f} | "
+                        f"{adaptation:.2f} | {change} |")
+        st.markdown("\n".join(rows))
+
+# 시간대별 감정 추이 (음성은 Whisper 구간 시각, 텍스트는 메시지 순서 기준으로 구간을 나눔)
+TIMELINE_WINDOW_SECONDS = 60
+TIMELINE_WINDOW_MESSAGES = 20
+TIMELINE_BATCH_SIZE = 16
+
+# units: [(위치, 텍스트)] — 위치는 초(음성) 또는 메시지 번호(텍스트)
+@instrumented("timeline")
+def build_timeline(units: list, window_size: float, batch_size: int = TIMELINE_BATCH_SIZE, score_cache: OrderedDict = None) -> list:
+    windows = []
+    for position, text in units:
+        bucket = int(position // window_size)
+        if not windows or windows[-1]["bucket"] != bucket:
+            windows.append({"bucket": bucket, "start": bucket * window_size, "end": (bucket + 1) * window_size, "texts": []})
+        windows[-1]["texts"].append(text)
+
+    cleaned_texts = [clean_text(" ".join(window.pop("texts"))) for window in windows]
+    if score_cache is not None:
+        scored = score_cleaned_texts_cached(cleaned_texts, score_cache, batch_size=batch_size)
+    else:
+        scored = score_cleaned_texts(cleaned_texts, batch_size=batch_size)
+
+    timeline = []
+    for window, cleaned, (scores, weights) in zip(windows, cleaned_texts, scored):
+        if not scores:
+            continue
+        emotion_scores, _ = aggregate_window_scores(scores, weights)
+        scheme = label_scheme(scores, weights)
+        timeline.append({
+            "start": window["start"],
+            "end": window["end"],
+            "chars": len(cleaned),
+            "sadness": emotion_scores.get("sadness", 0),
+            "fear": emotion_scores.get("fear", 0),
+            "지배 감정": max(emotion_scores, key=emotion_scores.get),
+            "자살 위험 여부": detect_suicide_risk(emotion_scores, len(cleaned), scheme),
+            "감정 라벨 기준": scheme,
+        })
+    return timeline
+
+def timeline_units_from_segments(segments: list) -> list:
+    return [(segment["start"], segment["text"]) for segment in segments if segment["text"]]
+
+# 화자 구분이 있으면 발화 단위, 없으면 문장 단위를 메시지로 봄
+def timeline_units_from_text(normalized: NormalizedText) -> list:
+    if len(normalized.utterances) >= 2:
+        messages = [normalized.cleaned[start:end] for _, start, end in normalized.utterances]
+    else:
+        messages = SENTENCE_BOUNDARY_PATTERN.split(normalized.cleaned)
+    return [(index, message) for index, message in enumerate(m for m in messages if m.strip())]
+
+# 붙여넣기 탭 증분 분석 (대화를 메시지 묶음 단위로 나누어 묶음별 점수를 세션에 보관, 새로 생기거나 바뀐 묶음만 추론)
+# 화자별 분석과 시간대별 추이도 같은 세션 캐시에 발화·구간별 점수를 보관
+INCREMENTAL_SEGMENT_MESSAGES = 8
+INCREMENTAL_SEGMENT_MAX_CHARS = 1500
+INCREMENTAL_CACHE_SIZE = 5000
+
+# score_cache: 텍스트 키 → (구간별 점수, 구간별 토큰 수), 오래 쓰지 않은 것부터 삭제
+def score_cleaned_texts_cached(cleaned_texts: list, score_cache: OrderedDict, batch_size: int = EMOTION_BATCH_SIZE) -> list:
+    keys = [result_cache_key(text.encode("utf-8"), kind="emotion-segment", **EMOTION_CACHE_OPTIONS) for text in cleaned_texts]
+    missing = {key: text for key, text in zip(keys, cleaned_texts) if key not in score_cache}
+    for key, part in zip(missing, score_cleaned_texts(list(missing.values()), batch_size=batch_size)):
+        score_cache[key] = part
+    parts = []
+    for key in keys:
+        score_cache.move_to_end(key)
+        parts.append(score_cache[key])
+    while len(score_cache) > INCREMENTAL_CACHE_SIZE:
+        score_cache.popitem(last=False)
+    add_stage_counter("segments_scored", len(missing))
+    return parts
+
+# 메시지 내용으로 묶음 경계를 정해 중간을 고쳐도 고친 부분 근처의 묶음만 바뀌도록 함
+def split_incremental_segments(messages: list, target: int = INCREMENTAL_SEGMENT_MESSAGES, max_chars: int = INCREMENTAL_SEGMENT_MAX_CHARS) -> list:
+    segments = []
+    current = []
+    size = 0
+    for message in messages:
+        current.append(message)
+        size += len(message) + 1
+        boundary = int.from_bytes(hashlib.blake2b(message.encode("utf-8"), digest_size=4).digest(), "big") % target == 0
+        if boundary or size >= max_chars:
+            segments.append(" ".join(current))
+            current = []
+            size = 0
+    if current:
+        segments.append(" ".join(current))
+    return segments
+
+# segment_cache: 묶음 키 → (구간별 점수, 구간별 토큰 수), 세션마다 하나씩 유지
+@instrumented("incremental_analysis")
+def analyze_text_incremental(normalized: NormalizedText, segment_cache: OrderedDict, batch_size: int = EMOTION_BATCH_SIZE) -> dict:
+    if len(normalized.cleaned) < 10:
+        return insufficient_results()
+    segments = split_incremental_segments([message for _, message in timeline_units_from_text(normalized)])
+    parts = score_cleaned_texts_cached(segments, segment_cache, batch_size=batch_size)
+    add_stage_counter("segments", len(segments))
+    return combine_window_scores(normalized.cleaned, parts)
+
+TIMELINE_RISK_COLORS = {"⚠️ 위험 신호 감지": "#c0392b", "❗️ 관심 필요": "#e67e22"}
+
+def render_timeline(timeline: list, unit: str):
+    if len(timeline) < 2:
+        st.info("시간대별 추이를 그리기에는 대화 구간이 부족합니다.")
+        return
+
+    scale = 60 if unit == "seconds" else 1
+    xs = [(w["start"] + w["end"]) / 2 / scale for w in timeline]
+    fig, ax = plt.subplots(figsize=(8, 3.2))
+    ax.plot(xs, [w["sadness"] for w in timeline], marker="o", markersize=3, label="sadness (슬픔)", color="#2980b9")
+    ax.plot(xs, [w["fear"] for w in timeline], marker="o", markersize=3, label="fear (두려움)", color="#8e44ad")
+    # 위험 기준선은 구간마다 그 구간의 라벨 체계 기준으로 그림 (한국어 구간은 다국어 모델 기준)
+    ax.hlines([EMOTION_THRESHOLDS[w.get("감정 라벨 기준", LABEL_SCHEME_FULL)]["danger_sadness"] for w in timeline],
+              [w["start"] / scale for w in timeline], [w["end"] / scale for w in timeline],
+              color="#c0392b", linestyle="--", linewidth=0.8)
+    for x, w in zip(xs, timeline):
+        color = TIMELINE_RISK_COLORS.get(w["자살 위험 여부"])
+        if color:
+            ax.axvspan((w["start"]) / scale, w["end"] / scale, color=color, alpha=0.12, linewidth=0)
+    ax.set_ylim(0, 1)
+    ax.set_xlabel("시간(분)" if unit == "seconds" else "메시지 순서")
+    ax.set_ylabel("점수")
+    ax.legend(loc="upper right", fontsize=8)
+    fig.tight_layout()
+    st.markdown("### 📈 시간대별 감정 추이")
+    st.pyplot(fig)
+    plt.close(fig)
+
+    flagged = [w for w in timeline if w["자살 위험 여부"] in TIMELINE_RISK_COLORS]
+    if flagged:
+        rows = ["| 구간 | 판정 | 슬픔 | 두려움 |", "|---|---|---|---|"]
+        for w in flagged:
+            if unit == "seconds":
+                span = f"{int(w['start'] // 60)}:{int(w['start'] % 60):02d} ~ {int(w['end'] // 60)}:{int(w['end'] % 60):02d}"
+            else:
+                span = f"{int(w['start']) + 1} ~ {int(w['end'])}번째 메시지"
+            rows.append(f"| {span} | {w['자살 위험 여부']} | {w['sadness']:.2f} | {w['fear']:.2f} |")
+        st.markdown("\n".join(rows))
+
+# 텍스트 파일 디코딩 (BOM, 없으면 처음 나오는 비ASCII 바이트부터 일정 크기로 인코딩을 판별: UTF-8 → CP949)
+# ASCII는 UTF-8/CP949 어느 쪽으로 읽어도 같으므로, 앞부분이 영문뿐인 CP949 파일도 한글이 나오는 지점에서 판별됨
+TEXT_SNIFF_BYTES = 64 * 1024
+TEXT_DECODE_CHUNK_BYTES = 256 * 1024
+TEXT_PREVIEW_CHARS = 5000
+TEXT_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+NON_ASCII_PATTERN = re.compile(rb"[\x80-\xff]")
+
+def sniff_text_encoding(prefix: bytes) -> str:
+    if prefix.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if prefix.startswith(codecs.BOM_UTF16_LE) or prefix.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    try:
+        # 앞부분 끝에서 잘린 멀티바이트 문자는 오류로 보지 않음
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp949"
+
+def decode_errors_for(encoding: str) -> str:
+    # 판별 이후 일부 바이트만 깨진 UTF 파일은 해당 문자만 대체, CP949는 기존과 같이 무시
+    return "ignore" if encoding == "cp949" else "replace"
+
+# 인코딩 판별에 쓸 부분 (BOM이 있으면 맨 앞, 없으면 처음 나오는 비ASCII 바이트부터)
+def text_sniff_sample(data: bytes) -> bytes:
+    if data.startswith(TEXT_BOMS):
+        return data[:TEXT_SNIFF_BYTES]
+    match = NON_ASCII_PATTERN.search(data)
+    return data[match.start():match.start() + TEXT_SNIFF_BYTES] if match else b""
+
+@instrumented("decode_text", measure_memory=False)
+def decode_text_bytes(data: bytes) -> str:
+    encoding = sniff_text_encoding(text_sniff_sample(data))
+    return codecs.decode(data, encoding, decode_errors_for(encoding))
+
+# 업로드 파일을 일정 크기씩 읽어 줄 단위로 디코딩 (파일 전체를 문자열로 만들지 않음)
+def iter_decoded_lines(binary_file, encoding: str = None, chunk_size: int = TEXT_DECODE_CHUNK_BYTES):
+    chunk = binary_file.read(TEXT_SNIFF_BYTES)
+    pending = ""
+    if encoding is None and not chunk.startswith(TEXT_BOMS):
+        # ASCII로만 된 앞부분은 바로 내보내고, 처음 나오는 비ASCII 바이트부터 읽어 둔 만큼으로 인코딩 판별
+        match = NON_ASCII_PATTERN.search(chunk)
+        while chunk and match is None:
+            lines, pending = split_complete_lines(pending + chunk.decode("ascii"))
+            yield from lines
+            chunk = binary_file.read(chunk_size)
+            match = NON_ASCII_PATTERN.search(chunk)
+        if match:
+            pending += chunk[:match.start()].decode("ascii")
+            chunk = chunk[match.start():]
+            if len(chunk) < TEXT_SNIFF_BYTES:
+                chunk += binary_file.read(TEXT_SNIFF_BYTES - len(chunk))
+    encoding = encoding or sniff_text_encoding(chunk)
+    decoder = codecs.getincrementaldecoder(encoding)(errors=decode_errors_for(encoding))
+    while chunk:
+        lines, pending = split_complete_lines(pending + decoder.decode(chunk))
+        yield from lines
+        chunk = binary_file.read(chunk_size)
+    pending += decoder.decode(b"", final=True)
+    for line in LINE_BREAK_PATTERN.split(pending):
+        if line:
+            yield line
+
+# 줄바꿈은 \r\n, \r(옛 Mac 형식), \n 모두 인식
+LINE_BREAK_PATTERN = re.compile(r"\r\n|\r|\n")
+
+# 완성된 줄 목록과 아직 끝나지 않은 나머지를 돌려줌 (끝의 \r은 다음 조각의 \n과 이어질 수 있으므로 나머지에 남김)
+def split_complete_lines(text: str) -> tuple:
+    lines = LINE_BREAK_PATTERN.split(text)
+    pending = lines.pop()
+    if not pending and text.endswith("\r"):
+        pending = lines.pop() + "\r"
+    return lines, pending
+
+# 줄 스트림을 그대로 넘기면서 화면 미리보기용 앞부분만 따로 모음
+def iter_with_preview(lines, preview: list, limit: int = TEXT_PREVIEW_CHARS):
+    size = 0
+    for line in lines:
+        if size < limit:
+            preview.append(line[:limit - size])
+            size += len(line) + 1
+        yield line
+
+# 음성 디코딩
+WHISPER_SAMPLE_RATE = 16000
+
+# 업로드 버퍼를 복사하지 않고 메모리뷰로 접근 (UploadedFile/BytesIO는 getbuffer 지원)
+@contextmanager
+def audio_buffer_view(file_buffer):
+    view = file_buffer.getbuffer() if hasattr(file_buffer, "getbuffer") else memoryview(file_buffer.getvalue())
+    try:
+        yield view
+    finally:
+        try:
+            view.release()
+        except BufferError:
+            pass  # 예외 추적 정보가 아직 디코딩 중이던 배열을 참조하는 경우
+
+def audio_suffix(file_buffer) -> str:
+    return os.path.splitext(getattr(file_buffer, "name", "") or "")[1].lower() or ".mp3"
+
+# 업로드된 음성을 임시 파일 없이 16kHz mono float32 배열로 디코딩 (PCM WAV는 직접 해석, 나머지는 ffmpeg 파이프)
+@instrumented("decode_audio")
+def decode_audio_bytes(audio_bytes, suffix: str = ".mp3", sr: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    add_stage_counter("input_bytes", len(audio_bytes))
+    audio = None
+    if bytes(audio_bytes[:4]) == b"RIFF" and bytes(audio_bytes[8:12]) == b"WAVE":
+        audio = decode_wav_bytes(audio_bytes, sr)
+    if audio is None:
+        try:
+            audio = decode_with_ffmpeg(audio_bytes, sr)
+        except subprocess.CalledProcessError:
+            # moov 정보가 파일 끝에 있는 m4a 등은 파이프 입력으로 탐색이 불가능해 파일로만 디코딩 가능
+            audio = decode_with_ffmpeg_file(audio_bytes, suffix, sr)
+    add_stage_counter("audio_sec", len(audio) / sr)
+    return audio
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_FLOAT = 3
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 샘플레이트가 일치하는 PCM/float WAV만 직접 해석 (리샘플링이 필요하면 None을 반환해 ffmpeg로 처리)
+def decode_wav_bytes(audio_bytes, sr: int = WHISPER_SAMPLE_RATE):
+    fmt = None
+    position = 12
+    while position + 8 <= len(audio_bytes):
+        chunk_id = bytes(audio_bytes[position:position + 4])
+        chunk_size = struct.unpack_from("<I", audio_bytes, position + 4)[0]
+        body = position + 8
+        if chunk_id == b"fmt ":
+            # 잘렸거나 너무 짧은 fmt 청크는 해석하지 않고 ffmpeg로 넘김
+            if chunk_size < 16 or body + 16 > len(audio_bytes):
+                return None
+            fmt = struct.unpack_from("<HHIIHH", audio_bytes, body)
+            if fmt[0] == WAV_FORMAT_EXTENSIBLE and chunk_size >= 40 and body + 26 <= len(audio_bytes):
+                fmt = (struct.unpack_from("<H", audio_bytes, body + 24)[0],) + fmt[1:]
+        elif chunk_id == b"data" and fmt is not None:
+            format_tag, channels, sample_rate, _, _, bits = fmt
+            dtype = {(WAV_FORMAT_PCM, 16): "<i2", (WAV_FORMAT_PCM, 32): "<i4", (WAV_FORMAT_FLOAT, 32): "<f4"}.get((format_tag, bits))
+            if dtype is None or sample_rate != sr or channels < 1:
+                return None
+            item_size = bits // 8
+            count = min(chunk_size, len(audio_bytes) - body) // (item_size * channels) * channels
+            samples = np.frombuffer(audio_bytes, dtype=dtype, count=count, offset=body)
+            if dtype == "<f4":
+                audio = samples.astype(np.float32)
+            else:
+                audio = samples.astype(np.float32) / float(2 ** (bits - 1))
+            if channels > 1:
+                audio = audio.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+            return audio
+        position = body + chunk_size + (chunk_size & 1)
+    return None
+
+def ffmpeg_decode_command(source: str, sr: int) -> list:
+    return ["ffmpeg", "-nostats", "-loglevel", "error", "-threads", "0", "-i", source,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "pipe:1"]
+
+def decode_with_ffmpeg(audio_bytes, sr: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    out = subprocess.run(ffmpeg_decode_command("pipe:0", sr), input=audio_bytes, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+def decode_with_ffmpeg_file(audio_bytes, suffix: str, sr: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
     tmp_dir = None
     try:
         tmp_dir = tempfile.mkdtemp()
-        tmp_path = os.path.join(tmp_dir, "uploaded_audio.mp3")
-
+        tmp_path = os.path.join(tmp_dir, "uploaded_audio" + suffix)
         with open(tmp_path, 'wb') as f:
-            f.write(file_buffer.getvalue())  # getvalue()를 사용해 파일 버퍼의 내용을 읽음
-        
-        result = whisper_model.transcribe(tmp_path, fp16=False)
-        return result["text"]
+            f.write(audio_bytes)
+        out = subprocess.run(ffmpeg_decode_command(tmp_path, sr), capture_output=True, check=True).stdout
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
     finally:
         if tmp_dir and os.path.exists(tmp_dir):
             shutil.rmtree(tmp_dir)
 
+# Whisper STT
+@instrumented("transcribe_audio")
+def transcribe_audio(file_buffer, use_cache: bool = True, model_name: str = WHISPER_MODEL_NAME) -> str:
+    with audio_buffer_view(file_buffer) as audio_view:
+        cache_key = result_cache_key(audio_view, kind="transcript", model=model_name, backend=WHISPER_BACKEND, fp16=False,
+                                     language=WHISPER_LANGUAGE)
+        if use_cache:
+            cached = result_cache_get(cache_key)
+            if cached is not None:
+                return cached["text"]
+        audio = decode_audio_bytes(audio_view, audio_suffix(file_buffer))
+
+    add_stage_counter("audio_sec", len(audio) / WHISPER_SAMPLE_RATE)
+    with use_whisper_model(model_name) as model, stage_timer("whisper"):
+        result = model.transcribe(audio, fp16=False, language=WHISPER_LANGUAGE)
+    if use_cache:
+        result_cache_put(cache_key, {"text": result["text"]})
+    return result["text"]
+
+# 구간별 스트리밍 STT (일정 길이 구간마다 변환 결과를 바로 반환)
+STREAM_SEGMENT_SECONDS = 30
+STREAM_CUT_SEARCH_SECONDS = 2
+
+# 구간 경계 직전에서 가장 조용한 지점을 찾아 단어가 잘리지 않도록 분할
+def find_quiet_cut(audio: np.ndarray, target: int, search: int, frame: int = WHISPER_SAMPLE_RATE // 10) -> int:
+    if target >= len(audio):
+        return len(audio)
+    window = audio[max(0, target - search):target]
+    if len(window) < frame * 2:
+        return target
+    frames = window[:len(window) // frame * frame].reshape(-1, frame)
+    quietest = int(np.argmin(np.square(frames).mean(axis=1)))
+    return max(0, target - search) + quietest * frame + frame // 2
+
+def iter_transcribe_segments(file_buffer, segment_seconds: int = STREAM_SEGMENT_SECONDS, use_cache: bool = True,
+                             model_name: str = WHISPER_MODEL_NAME):
+    with audio_buffer_view(file_buffer) as audio_view:
+        cache_key = result_cache_key(audio_view, kind="transcript-chunks", model=model_name,
+                                     backend=WHISPER_BACKEND, fp16=False, segment_seconds=segment_seconds, language=WHISPER_LANGUAGE)
+        cached = result_cache_get(cache_key) if use_cache else None
+        if cached is None:
+            audio = decode_audio_bytes(audio_view, audio_suffix(file_buffer))
+    # 캐시에도 구간별 변환 결과를 보관해 다시 분석할 때 새로 변환할 때와 같은 단위로 감정 분석
+    if cached is not None:
+        for index, chunk in enumerate(cached["chunks"]):
+            yield {"index": index, "start": chunk["start"], "end": chunk["end"], "text": chunk["text"], "segments": chunk["segments"],
+                   "progress": chunk["end"] / cached["duration"] if cached["duration"] else 1.0, "cached": True}
+        return
+
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    segment_samples = segment_seconds * WHISPER_SAMPLE_RATE
+    chunks = []
+    language = WHISPER_LANGUAGE
+    start = 0
+    index = 0
+    # 전체 변환이 끝날 때까지 모델 참조를 유지 (구간마다 놓으면 메모리 예산이 빠듯할 때 매 구간 다시 로딩됨)
+    with pin_whisper_model(model_name) as model:
+        while start < len(audio):
+            end = find_quiet_cut(audio, start + segment_samples, STREAM_CUT_SEARCH_SECONDS * WHISPER_SAMPLE_RATE)
+            if end <= start:
+                end = min(start + segment_samples, len(audio))
+            # 앞 구간 마지막 문장을 프롬프트로 넘겨 구간 사이 문맥 유지
+            prompt = chunks[-1]["text"][-200:] if chunks else None
+            with whisper_model_lock(model_name), stage_timer("whisper"):
+                add_stage_counter("audio_sec", (end - start) / WHISPER_SAMPLE_RATE)
+                result = model.transcribe(audio[start:end], fp16=False, initial_prompt=prompt, language=language)
+
+            offset = start / WHISPER_SAMPLE_RATE
+            segments = [
+                {"start": round(seg["start"] + offset, 2), "end": round(seg["end"] + offset, 2), "text": seg["text"].strip()}
+                for seg in result.get("segments", [])
+            ]
+            text = result["text"].strip()
+            # 말소리가 있는 첫 구간에서 감지한 언어를 이후 구간에 고정 (구간마다 언어 감지를 반복하지 않음)
+            if language is None and text:
+                language = result.get("language")
+            chunks.append({"start": offset, "end": end / WHISPER_SAMPLE_RATE, "text": text, "segments": segments})
+            yield {"index": index, "start": offset, "end": end / WHISPER_SAMPLE_RATE, "text": text,
+                   "segments": segments, "progress": end / len(audio), "cached": False}
+            start = end
+            index += 1
+
+    if use_cache:
+        result_cache_put(cache_key, {"chunks": chunks, "duration": duration})
+
+# 스트리밍 STT + 감정 분석 (변환이 끝난 구간은 다음 구간 변환 중에 바로 감정 분석)
+def analyze_audio_streaming(file_buffer, on_update=None, use_cache: bool = True, model_name: str = WHISPER_MODEL_NAME) -> tuple:
+    texts = []
+    segments = []
+    futures = []
+    cached_texts = []
+    from_cache = False
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for segment in iter_transcribe_segments(file_buffer, use_cache=use_cache, model_name=model_name):
+            from_cache = segment["cached"]
+            if segment["text"]:
+                texts.append(segment["text"])
+            segments.extend(segment["segments"])
+            if from_cache:
+                cached_texts.append(segment["text"])
+            else:
+                futures.append(executor.submit(with_current_context(score_text_windows), segment["text"]))
+
+            if on_update:
+                finished = [f.result() for f in futures if f.done()]
+                interim = combine_window_scores(clean_text(" ".join(texts)), finished) if finished else None
+                on_update(" ".join(texts), segment, interim)
+
+        parts = [f.result() for f in futures]
+
+    # 캐시된 변환 결과도 구간별로 분석해 합침 (새로 변환할 때와 같은 점수), 구간들은 한 번의 배치 호출로 처리
+    if from_cache:
+        parts = score_cleaned_texts([cleaned for cleaned in map(clean_text, cached_texts) if cleaned])
+    transcript = " ".join(texts)
+    results = combine_window_scores(clean_text(transcript), parts)
+    return transcript, results, segments
+
+# 백그라운드 분석 작업 큐 (프로세스 공용, 세션 재실행과 무관하게 작업 유지)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_RETENTION_SECONDS = 60 * 60
+JOB_POLL_SECONDS = 1.0
+
+JOB_PENDING = "대기 중"
+JOB_RUNNING = "진행 중"
+JOB_DONE = "완료"
+JOB_FAILED = "실패"
+
+class AnalysisJob:
+    def __init__(self, job_id: str, label: str):
+        self.id = job_id
+        self.label = label
+        self.status = JOB_PENDING
+        self.progress = 0.0
+        self.message = "다른 분석이 끝나기를 기다리는 중입니다."
+        self.partial_text = ""
+        self.interim = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.metrics = []
+
+    def update(self, progress: float = None, message: str = None, partial_text: str = None, interim: dict = None):
+        if progress is not None:
+            self.progress = min(1.0, max(0.0, progress))
+        if message is not None:
+            self.message = message
+        if partial_text is not None:
+            self.partial_text = partial_text
+        if interim is not None:
+            self.interim = interim
+
+    @property
+    def active(self) -> bool:
+        return self.status in (JOB_PENDING, JOB_RUNNING)
+
+class JobQueue:
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, label: str, func, *args) -> str:
+        job = AnalysisJob(uuid.uuid4().hex, label)
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, func, args)
+        return job.id
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job: AnalysisJob, func, args):
+        job.status = JOB_RUNNING
+        job.message = "분석을 시작합니다."
+        try:
+            with collect_stage_metrics() as records:
+                job.metrics = records
+                job.result = func(job, *args)
+            job.update(progress=1.0, message="분석이 완료되었습니다.")
+            job.status = JOB_DONE
+        except Exception as e:
+            logger.exception("분석 작업 %s 실패", job.id)
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at and time.time() - job.finished_at > JOB_RETENTION_SECONDS]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue() -> JobQueue:
+    return JobQueue(JOB_WORKERS)
+
+# 업로드 파일은 재실행 시 교체될 수 있으므로 작업에는 내용을 복사한 버퍼를 넘김
+def detach_upload(uploaded_file) -> io.BytesIO:
+    buffer = io.BytesIO(uploaded_file.getvalue())
+    buffer.name = uploaded_file.name
+    return buffer
+
+# 음성 분석 작업 (STT → 감정 분석 → 보고서)
+def run_audio_analysis_job(job: AnalysisJob, file_buffer, with_timeline: bool = False, model_name: str = WHISPER_MODEL_NAME) -> dict:
+    def on_update(partial_transcript, segment, interim):
+        job.update(progress=segment["progress"] * 0.9, message=f"음성 인식 중... ({segment['end']:.0f}초 지점까지 변환)",
+                   partial_text=partial_transcript, interim=interim)
+
+    with stage_timer("audio_pipeline"):
+        transcript, results, segments = analyze_audio_streaming(file_buffer, on_update=on_update, model_name=model_name)
+    job.update(progress=0.95, message="보고서 생성 중...", partial_text=transcript)
+    record = build_result_record(results, extract_person_names(transcript), source=getattr(file_buffer, "name", ""))
+    timeline = build_timeline(timeline_units_from_segments(segments), TIMELINE_WINDOW_SECONDS) if with_timeline else None
+    return {
+        "transcript": transcript,
+        "results": results,
+        "segments": segments,
+        "record": dump_result_record(record),
+        "speaker_results": analyze_speakers(transcript),
+        "timeline": timeline,
+    }
+
+# 여러 음성 파일 일괄 분석 작업 (디코딩/STT는 제한된 스레드 풀에서 진행, 감정 분석은 한 번에 배치 처리)
+AUDIO_BATCH_WORKERS = int(os.environ.get("AUDIO_BATCH_WORKERS", 2))
+
+def run_audio_batch_job(job: AnalysisJob, file_buffers: list, model_name: str = WHISPER_MODEL_NAME) -> dict:
+    transcripts = [None] * len(file_buffers)
+    errors = {}
+    done = 0
+    # ffmpeg 디코딩은 병렬로 진행되고, Whisper 추론은 모델 잠금으로 순서대로 실행됨
+    with ThreadPoolExecutor(max_workers=AUDIO_BATCH_WORKERS) as executor:
+        futures = {executor.submit(with_current_context(transcribe_audio), buffer, model_name=model_name): index
+                   for index, buffer in enumerate(file_buffers)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                transcripts[index] = future.result()
+            except Exception as e:
+                errors[index] = str(e)
+                transcripts[index] = ""
+            done += 1
+            job.update(progress=done / len(file_buffers) * 0.85, message=f"음성 인식 중... ({done}/{len(file_buffers)}개 완료)")
+
+    job.update(progress=0.9, message="감정 분석 및 보고서 생성 중...")
+    names = [buffer.name for buffer in file_buffers]
+    batch = build_batch_results(names, transcripts)
+    for index, error in errors.items():
+        batch["files"][index]["report"] = f"음성 파일 처리 중 오류가 발생했습니다: {error}"
+        batch["rows"][index]["자살 위험 여부"] = "오류"
+    batch["archive"] = build_report_archive(batch)
+    return batch
+
+# 여러 문서를 한 번에 감정 분석하고 파일별 보고서와 요약 표 구성 (문자열 또는 NormalizedText)
+# 파일별 결과는 레코드로 보관하고, 요약표 행(summary.csv 열 이름)만 레코드에서 만들어 둠
+def build_batch_results(names: list, texts: list) -> dict:
+    normalized = [t if isinstance(t, NormalizedText) else normalize_text(t) for t in texts]
+    files = []
+    rows = []
+    batch_results = analyze_documents([n.cleaned for n in normalized], pre_cleaned=True)
+    for name, text, results in zip(names, normalized, batch_results):
+        record = build_result_record(results, text.participants[:3], source=name)
+        # 작업 스레드에서도 호출되므로 st.cache_data를 거치지 않고 보고서 생성
+        files.append({"name": name, "record": dump_result_record(record), "report": format_record_report(record)})
+        emotions = dict(zip(EMOTION_LABELS, record.emotions))
+        rows.append({
+            "파일": name,
+            "자살 위험 여부": RISK_LABELS[RiskLevel(record.risk)],
+            "지배 감정": max(emotions, key=emotions.get) if record.window_count else "정보 부족",
+            **dict(zip(ORG_EVAL_KEYS, record.org)),
+        })
+    return {"batch": True, "files": files, "rows": rows}
+
+# 파일별 보고서(.md)와 요약표(summary.csv)를 하나의 zip으로 묶음
+def build_report_archive(batch: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        summary = io.StringIO()
+        writer = csv.DictWriter(summary, fieldnames=list(batch["rows"][0].keys()) if batch["rows"] else ["파일"])
+        writer.writeheader()
+        writer.writerows(batch["rows"])
+        archive.writestr("summary.csv", "\ufeff" + summary.getvalue())
+        for index, entry in enumerate(batch["files"], start=1):
+            base_name = os.path.splitext(os.path.basename(entry["name"]))[0]
+            archive.writestr(f"{index:03d}_{base_name}.md", entry["report"])
+    return buffer.getvalue()
+
+def render_batch_results(batch: dict, key: str):
+    st.markdown("### 📊 파일별 분석 요약")
+    rows = ["| 파일 | 자살 위험 여부 | 지배 감정 | 규율성 | 충성심 | 스트레스 저항력 |", "|---|---|---|---|---|---|"]
+    for row in batch["rows"]:
+        rows.append(f"| {row['파일']} | {row['자살 위험 여부']} | {row['지배 감정']} | {row['규율성']:.2f} | {row['충성심']:.2f} | {row['스트레스 저항력']:.2f} |")
+    st.markdown("\n".join(rows))
+    st.download_button("📦 전체 보고서 내려받기 (zip)", batch["archive"], file_name="reports.zip", mime="application/zip", key=f"{key}_archive")
+    for entry in batch["files"]:
+        with st.expander(f"📄 {entry['name']}"):
+            st.markdown(f'<div class="report">{entry["report"]}</div>', unsafe_allow_html=True)
+
+def rerun():
+    (getattr(st, "rerun", None) or st.experimental_rerun)()
+
+# 음성 작업 진행 상황 또는 결과 표시 (진행 중이면 True)
+def render_audio_job(audio_job) -> bool:
+    if audio_job and audio_job.active:
+        st.progress(audio_job.progress)
+        st.caption(f"{audio_job.label}: {audio_job.message}")
+        if audio_job.partial_text:
+            st.text_area("🎤 변환된 텍스트 (변환 중)", audio_job.partial_text, height=200)
+        if audio_job.interim and audio_job.interim["지배 감정"] != "정보 부족":
+            st.caption(f"현재까지 지배 감정: {audio_job.interim['지배 감정']} / 자살 위험 여부: {audio_job.interim['자살 위험 여부']}")
+        return True
+    if audio_job and audio_job.status == JOB_FAILED:
+        st.error(f"음성 파일 처리 중 오류가 발생했습니다: {audio_job.error}")
+    elif audio_job and audio_job.result.get("batch"):
+        render_batch_results(audio_job.result, key="audio_batch")
+        render_diagnostics(audio_job.metrics)
+    elif audio_job:
+        st.text_area("🎤 변환된 텍스트", audio_job.result["transcript"], height=200)
+        render_result_record(audio_job.result["record"], key=f"audio_{audio_job.id}")
+        render_speaker_profiles(audio_job.result["speaker_results"])
+        if audio_job.result.get("timeline") is not None:
+            render_timeline(audio_job.result["timeline"], unit="seconds")
+        render_diagnostics(audio_job.metrics)
+    return False
+
+# st.fragment(run_every=...)로 주기적으로 다시 그리는 영역 — 작업이 끝나면 전체를 한 번 다시 그려 주기 실행을 멈추고 기록 갱신
+def render_audio_job_fragment(polling: bool):
+    audio_job = get_job_queue().get(st.session_state.get("audio_job_id"))
+    if not render_audio_job(audio_job) and polling:
+        rerun()
+
+# 텍스트·붙여넣기 탭 결과 표시 (세션에 보관한 결과로 그려 다른 동작으로 화면이 다시 그려져도 유지)
+def render_text_analysis(analysis: dict, key: str):
+    if analysis.get("batch"):
+        render_batch_results(analysis["batch"], key=f"{key}_batch")
+    else:
+        if analysis.get("preview") is not None:
+            st.text_area("📜 텍스트 내용 (미리보기)", analysis["preview"], height=200)
+            if analysis["char_count"] > TEXT_PREVIEW_CHARS:
+                st.caption(f"전체 {analysis['char_count']:,}자 중 앞부분 {TEXT_PREVIEW_CHARS:,}자만 표시합니다. 분석은 전체 내용으로 진행됩니다.")
+        render_result_record(analysis["record"], key=f"{key}_report")
+        render_speaker_profiles(analysis["speaker_results"])
+        if analysis.get("timeline") is not None:
+            render_timeline(analysis["timeline"], unit="messages")
+    render_diagnostics(analysis["metrics"])
+
 # 인증
 def verify_access_code():
     if 'authenticated' not in st.session_state:
@@ -265,12 +2146,20 @@ def verify_access_code():
 def main():
     if not verify_access_code():
         return
+
+    if PREWARM_WHISPER:
+        prewarm_whisper_model()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
     
+    # 오프라인 환경에서는 웹 폰트를 불러오지 않고 설치된 한글 글꼴 사용
+    if not OFFLINE_MODE:
+        st.markdown("<style>@import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@300;400;700&display=swap');</style>",
+                    unsafe_allow_html=True)
     st.markdown("""
     <style>
-        @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@300;400;700&display=swap');
         body {
-            font-family: 'Noto Sans KR', sans-serif;
+            font-family: 'Noto Sans KR', 'Malgun Gothic', 'Apple SD Gothic Neo', sans-serif;
             background-color: #f7f9fc;
             color: #222222;
             margin: 0;
@@ -352,7 +2241,7 @@ def main():
             border-radius: 12px !important;
             border: 1.8px solid #bdc3c7 !important;
             resize: vertical !important;
-            font-family: 'Noto Sans KR', sans-serif !important;
+            font-family: 'Noto Sans KR', 'Malgun Gothic', 'Apple SD Gothic Neo', sans-serif !important;
         }
         .stButton > button {
             background-color: #27ae60;
@@ -387,7 +2276,7 @@ def main():
             box-shadow: inset 0 0 15px rgba(0,0,0,0.03);
             margin-top: 15px;
             overflow-x: auto;
-            font-family: 'Noto Sans KR', sans-serif;
+            font-family: 'Noto Sans KR', 'Malgun Gothic', 'Apple SD Gothic Neo', sans-serif;
         }
         @media (max-width: 480px) {
             .stApp {
@@ -417,70 +2306,98 @@ def main():
 
     tab1, tab2, tab3, tab4 = st.tabs(["1. 음성파일(STT) → 분석", "2. 텍스트 파일 → 분석", "3. 복사붙여넣기 대화분석", "💡 질문 예시"])
 
+    job_queue = get_job_queue()
+    poll_jobs = False
+
     with tab1:
         st.subheader("음성 파일 업로드 및 분석")
-        audio_file = st.file_uploader("🔊 음성 파일 업로드 (mp3, wav, m4a)", type=["mp3", "wav", "m4a"], key="audio_uploader")
-        if audio_file:
-            st.audio(audio_file)
+        audio_files = st.file_uploader("🔊 음성 파일 업로드 (mp3, wav, m4a, 여러 개 선택 가능)", type=["mp3", "wav", "m4a"],
+                                       key="audio_uploader", accept_multiple_files=True)
+        if audio_files:
+            if len(audio_files) == 1:
+                st.audio(audio_files[0])
+            else:
+                with st.expander(f"🔊 업로드한 파일 {len(audio_files)}개"):
+                    for audio_file in audio_files:
+                        st.caption(audio_file.name)
+                        st.audio(audio_file)
+            whisper_model_name = WHISPER_MODEL_NAME
+            if len(WHISPER_MODEL_CHOICES) > 1:
+                whisper_model_name = st.selectbox("🎙️ 음성 인식 모델 (큰 모델일수록 정확하지만 느림)", WHISPER_MODEL_CHOICES, key="whisper_model_name")
+            audio_timeline = len(audio_files) == 1 and st.checkbox("📈 시간대별 감정 추이 보기", key="audio_timeline")
             if st.button("📝 음성 → 텍스트 변환 및 분석", key="audio_analysis"):
-                with st.spinner("음성 인식 중... (파일 크기에 따라 수 분이 소요될 수 있습니다)"):
-                    try:
-                        transcript = transcribe_audio(audio_file)
-                        st.text_area("🎤 변환된 텍스트", transcript, height=200)
-                        participants = extract_person_names(transcript)
-                        
-                        with st.spinner("감정 분석 및 보고서 생성 중..."):
-                            results = analyze_texts([transcript])
-                            if 'cleaned_text' in results:
-                                report = generate_final_report(results, participants, results['cleaned_text'])
-                            else:
-                                report = "대화 내용이 너무 짧아 분석이 불가능합니다."
-                        st.markdown("### 📄 분석 결과 보고서")
-                        st.markdown(f'<div class="report">{report}</div>', unsafe_allow_html=True)
-
-                    except Exception as e:
-                        st.error(f"음성 파일 처리 중 오류가 발생했습니다: {e}")
+                if len(audio_files) == 1:
+                    st.session_state.audio_job_id = job_queue.submit(audio_files[0].name, run_audio_analysis_job,
+                                                                     detach_upload(audio_files[0]), audio_timeline, whisper_model_name)
+                else:
+                    st.session_state.audio_job_id = job_queue.submit(f"음성 파일 {len(audio_files)}개", run_audio_batch_job,
+                                                                     [detach_upload(f) for f in audio_files], whisper_model_name)
+
+        audio_job = job_queue.get(st.session_state.get("audio_job_id"))
+        if hasattr(st, "fragment"):
+            # 진행 중에는 이 영역만 주기적으로 다시 그려 다른 탭의 입력과 결과는 건드리지 않음
+            polling = bool(audio_job and audio_job.active)
+            st.fragment(render_audio_job_fragment, run_every=JOB_POLL_SECONDS if polling else None)(polling)
+        else:
+            poll_jobs = render_audio_job(audio_job)
 
     with tab2:
         st.subheader("텍스트 파일 업로드 및 분석")
-        text_file = st.file_uploader("📄 텍스트 파일 업로드 (.txt)", type=["txt"], key="textfile_uploader")
-        if text_file:
+        text_files = st.file_uploader("📄 텍스트 파일 업로드 (.txt, 여러 개 선택 가능)", type=["txt"], key="textfile_uploader", accept_multiple_files=True)
+        if text_files:
+            text_timeline = len(text_files) == 1 and st.checkbox("📈 시간대별 감정 추이 보기", key="text_timeline")
             if st.button("🔍 텍스트 분석 시작", key="text_analysis"):
-                try:
-                    content = text_file.read().decode('utf-8')
-                except UnicodeDecodeError:
-                    text_file.seek(0)
-                    content = text_file.read().decode('cp949', errors='ignore')
-                
-                st.text_area("📜 텍스트 내용", content, height=200)
-                participants = extract_person_names(content)
-                with st.spinner("감정 분석 중..."):
-                    results = analyze_texts([content])
-                    if 'cleaned_text' in results:
-                        report = generate_final_report(results, participants, results['cleaned_text'])
+                with collect_stage_metrics() as stage_records:
+                    if len(text_files) > 1:
+                        with st.spinner(f"텍스트 파일 {len(text_files)}개 감정 분석 중..."):
+                            batch = build_batch_results([f.name for f in text_files], [normalize_lines(iter_decoded_lines(f)) for f in text_files])
+                            batch["archive"] = build_report_archive(batch)
+                        analysis = {"batch": batch}
                     else:
-                        report = "대화 내용이 너무 짧아 분석이 불가능합니다."
-                st.markdown("### 📄 분석 결과 보고서")
-                st.markdown(f'<div class="report">{report}</div>', unsafe_allow_html=True)
+                        preview = []
+                        normalized = normalize_lines(iter_with_preview(iter_decoded_lines(text_files[0]), preview))
+                        participants = normalized.participants[:3]
+                        with st.spinner("감정 분석 중..."):
+                            results = analyze_texts([normalized.cleaned], pre_cleaned=True)
+                            analysis = {
+                                "preview": "\n".join(preview),
+                                "char_count": normalized.char_count,
+                                "record": dump_result_record(build_result_record(results, participants, source=text_files[0].name)),
+                                "speaker_results": analyze_speakers(normalized),
+                                "timeline": build_timeline(timeline_units_from_text(normalized), TIMELINE_WINDOW_MESSAGES) if text_timeline else None,
+                            }
+                analysis["metrics"] = stage_records
+                st.session_state.text_analysis_result = analysis
+        if st.session_state.get("text_analysis_result"):
+            render_text_analysis(st.session_state.text_analysis_result, key="text")
 
     with tab3:
         st.subheader("대화 내용 복사-붙여넣기 분석")
         input_text = st.text_area("💬 대화 내용 복사-붙여넣기", height=300)
         
+        paste_timeline = st.checkbox("📈 시간대별 감정 추이 보기", key="paste_timeline")
         if st.button("분석 시작", key="paste_analysis"):
             if not input_text.strip():
                 st.warning("텍스트를 입력해주세요.")
             else:
-                participants = extract_person_names(input_text)
-                with st.spinner("감정 분석 중..."):
-                    results = analyze_texts([input_text])
-                    if 'cleaned_text' in results:
-                        report = generate_final_report(results, participants, results['cleaned_text'])
-                    else:
-                        report = "대화 내용이 너무 짧아 분석이 불가능합니다."
-                st.markdown("### 📄 분석 결과 보고서")
-                st.markdown(f'<div class="report">{report}</div>', unsafe_allow_html=True)
-                
+                with collect_stage_metrics() as stage_records:
+                    normalized = normalize_text(input_text)
+                    participants = normalized.participants[:3]
+                    with st.spinner("감정 분석 중..."):
+                        # 이전 분석 이후 새로 붙여넣거나 고친 부분만 다시 추론
+                        segment_cache = st.session_state.setdefault("paste_segment_cache", OrderedDict())
+                        results = analyze_text_incremental(normalized, segment_cache)
+                        analysis = {
+                            "record": dump_result_record(build_result_record(results, participants, source="붙여넣기")),
+                            "speaker_results": analyze_speakers(normalized, score_cache=segment_cache),
+                            "timeline": build_timeline(timeline_units_from_text(normalized), TIMELINE_WINDOW_MESSAGES,
+                                                       score_cache=segment_cache) if paste_timeline else None,
+                        }
+                analysis["metrics"] = stage_records
+                st.session_state.paste_analysis_result = analysis
+        if st.session_state.get("paste_analysis_result"):
+            render_text_analysis(st.session_state.paste_analysis_result, key="paste")
+
     with tab4:
         st.header("💡 심리 및 조직 적응 분석을 위한 질문 예시")
         st.markdown("""
@@ -517,5 +2434,13 @@ def main():
         - 다른 사람의 부탁을 거절해야 할 때, 솔직하게 이야기하는 편인가요?
         """)
 
+    render_result_history()
+    render_model_status(get_model_registry())
+
+    # st.fragment가 없는 버전에서는 진행 중인 작업이 있으면 잠시 후 화면 전체를 다시 그려 진행 상황 갱신
+    if poll_jobs:
+        time.sleep(JOB_POLL_SECONDS)
+        rerun()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,225 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import app
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+TEXT_EXTENSIONS = (".txt",)
+CSV_FIELDS = ["path", "kind", "status", "자살 위험 여부", "지배 감정", "규율성", "충성심", "스트레스 저항력", "글자 수", "elapsed_sec", "error"]
+
+# 입력 목록 수집 (디렉터리 또는 목록 파일: 한 줄에 경로 하나, 혹은 {"path": ...} JSONL)
+def collect_inputs(source: str, recursive: bool = True) -> list:
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS + TEXT_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+            if not recursive:
+                break
+        return paths
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(path if os.path.isabs(path) else os.path.join(base_dir, path))
+    return paths
+
+# 이전 실행에서 성공적으로 처리된 경로 (중단 후 이어서 실행)
+def load_completed(output_path: str) -> set:
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 비정상 종료로 잘린 마지막 줄
+            if record.get("status") == "ok":
+                completed.add(record["path"])
+    return completed
+
+def open_append(path: str, encoding: str = "utf-8"):
+    # 잘린 마지막 줄 뒤에 이어 쓰지 않도록 줄바꿈 보정
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(path, "ab") as f:
+                f.write(b"\n")
+    return open(path, "a", encoding=encoding, newline="")
+
+# 작업 프로세스: 파일을 읽어 텍스트로 변환 (음성은 Whisper STT)
+def load_document(path: str, use_cache: bool = True) -> dict:
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.lower().endswith(AUDIO_EXTENSIONS):
+            kind = "audio"
+            text = app.transcribe_audio(io.BytesIO(data), use_cache=use_cache)
+        else:
+            kind = "text"
+            text = app.decode_text_bytes(data)
+        return {"path": path, "kind": kind, "text": text, "elapsed_sec": time.perf_counter() - started}
+    except Exception as e:
+        return {"path": path, "kind": "audio" if path.lower().endswith(AUDIO_EXTENSIONS) else "text",
+                "error": f"{type(e).__name__}: {e}", "elapsed_sec": time.perf_counter() - started}
+
+class ResultWriter:
+    def __init__(self, jsonl_path: str, csv_path: str = None):
+        self.jsonl = open_append(jsonl_path)
+        self.csv_file = None
+        self.csv_writer = None
+        if csv_path:
+            is_new = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            self.csv_file = open_append(csv_path, encoding="utf-8-sig")
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            if is_new:
+                self.csv_writer.writeheader()
+
+    def write(self, records: list):
+        for record in records:
+            self.jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self.csv_writer:
+                org_eval = record.get("조직 적응력 세분화", {})
+                self.csv_writer.writerow({**record, **org_eval})
+        # 배치마다 디스크에 반영해 중단되더라도 처리한 결과는 보존
+        for f in (self.jsonl, self.csv_file):
+            if f:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        for f in (self.jsonl, self.csv_file):
+            if f:
+                f.close()
+
+# 모아 둔 문서들을 한 번에 감정 분석하고 보고서 생성
+def analyze_batch(documents: list, batch_size: int, use_cache: bool) -> list:
+    records = []
+    ok_documents = [d for d in documents if "error" not in d]
+    started = time.perf_counter()
+    try:
+        batch_results = app.analyze_documents([d["text"] for d in ok_documents], batch_size=batch_size, use_cache=use_cache)
+    except Exception as e:
+        batch_results = [{"error": f"{type(e).__name__}: {e}"}] * len(ok_documents)
+    analysis_sec = (time.perf_counter() - started) / max(len(ok_documents), 1)
+
+    for document, results in zip(ok_documents, batch_results):
+        record = {"path": document["path"], "kind": document["kind"], "elapsed_sec": round(document["elapsed_sec"] + analysis_sec, 3)}
+        if "error" in results:
+            record.update(status="error", error=results["error"])
+            records.append(record)
+            continue
+
+        participants = app.extract_person_names(document["text"])
+        if 'cleaned_text' in results:
+            report = app.generate_final_report(results, participants, results['cleaned_text'])
+        else:
+            report = "대화 내용이 너무 짧아 분석이 불가능합니다."
+        record.update({
+            "status": "ok",
+            "자살 위험 여부": results["자살 위험 여부"],
+            "지배 감정": results["지배 감정"],
+            "감정 비율": results["감정 비율"],
+            "조직 적응력 세분화": results["조직 적응력 세분화"],
+            "글자 수": len(results.get("cleaned_text", "")),
+            "participants": participants,
+            "transcript": document["text"] if document["kind"] == "audio" else None,
+            "report": report,
+        })
+        records.append(record)
+
+    for document in documents:
+        if "error" in document:
+            records.append({"path": document["path"], "kind": document["kind"], "status": "error",
+                            "error": document["error"], "elapsed_sec": round(document["elapsed_sec"], 3)})
+    return records
+
+def format_throughput(done: int, elapsed: float) -> str:
+    per_hour = done / elapsed * 3600 if elapsed > 0 else 0.0
+    return f"{done}건 처리, {elapsed:.1f}초 경과, 시간당 {per_hour:.1f}건"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="음성/텍스트 파일 일괄 분석 (Streamlit 없이 실행)")
+    parser.add_argument("source", help="분석할 파일이 있는 디렉터리 또는 경로 목록 파일(.txt/.jsonl)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="결과 JSONL 경로 (기존 파일이 있으면 이어서 처리)")
+    parser.add_argument("--csv", help="요약 CSV 경로")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="음성 변환 작업 프로세스 수 (프로세스마다 Whisper 모델을 따로 로딩)")
+    parser.add_argument("--batch-files", type=int, default=16, help="감정 분석을 한 번에 묶어 처리할 파일 수")
+    parser.add_argument("--batch-size", type=int, default=app.EMOTION_BATCH_SIZE, help="감정 분석 모델 배치 크기")
+    parser.add_argument("--no-recursive", action="store_true", help="하위 디렉터리는 검색하지 않음")
+    parser.add_argument("--no-cache", action="store_true", help="결과 캐시를 사용하지 않음")
+    args = parser.parse_args(argv)
+
+    use_cache = not args.no_cache
+    paths = collect_inputs(args.source, recursive=not args.no_recursive)
+    completed = load_completed(args.output)
+    pending = [p for p in paths if p not in completed]
+    print(f"전체 {len(paths)}건 중 {len(completed & set(paths))}건은 이미 처리됨, {len(pending)}건 분석 시작", file=sys.stderr)
+
+    writer = ResultWriter(args.output, args.csv)
+    started = time.perf_counter()
+    done = 0
+    failed = 0
+    buffer = []
+
+    def flush():
+        nonlocal done, failed
+        if not buffer:
+            return
+        records = analyze_batch(buffer, args.batch_size, use_cache)
+        writer.write(records)
+        done += len(records)
+        failed += sum(1 for r in records if r["status"] != "ok")
+        buffer.clear()
+        print(format_throughput(done, time.perf_counter() - started), file=sys.stderr)
+
+    try:
+        text_paths = [p for p in pending if not p.lower().endswith(AUDIO_EXTENSIONS)]
+        audio_paths = [p for p in pending if p.lower().endswith(AUDIO_EXTENSIONS)]
+
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = [pool.submit(load_document, path, use_cache) for path in audio_paths]
+
+            # 음성 변환이 진행되는 동안 텍스트 파일부터 분석
+            for path in text_paths:
+                buffer.append(load_document(path, use_cache))
+                if len(buffer) >= args.batch_files:
+                    flush()
+            for future in as_completed(futures):
+                buffer.append(future.result())
+                if len(buffer) >= args.batch_files:
+                    flush()
+        flush()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "processed": done,
+        "failed": failed,
+        "skipped": len(paths) - len(pending),
+        "elapsed_sec": round(elapsed, 3),
+        "files_per_hour": round(done / elapsed * 3600, 1) if elapsed > 0 else 0.0,
+    }
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0 if failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+import app
+
+TEXT_STAGES = ("clean_text", "extract_person_names", "analyze_texts", "generate_final_report")
+AUDIO_STAGES = ("transcribe_audio",)
+DEFAULT_SIZES = ("1KB", "10KB", "100KB", "1MB")
+DEFAULT_DURATIONS = (10, 60, 300)
+
+KOREAN_SPEAKERS = ["민수", "지영", "상병김", "병장이", "중대장"]
+ENGLISH_SPEAKERS = ["Alex", "Jordan", "Sam", "Taylor"]
+KOREAN_SENTENCES = [
+    "요즘 훈련이 많이 힘들어서 잠을 잘 못 자고 있어요.",
+    "주말에 가족들이랑 통화해서 기분이 좋아졌습니다!",
+    "선임이랑 의견 충돌이 있었는데 잘 해결됐어요.",
+    "가끔은 아무것도 하기 싫고 혼자 있고 싶을 때가 있어요.",
+    "다음 달 휴가 계획 세우는 중인데 정말 기대돼요 ㅎㅎ",
+    "솔직히 요즘 좀 불안하고 걱정이 많아요...",
+    "오늘 점심 메뉴는 뭐였어? 맛있었어?",
+]
+ENGLISH_SENTENCES = [
+    "I have been feeling really tired lately and can't focus.",
+    "That was a great day, thanks for the help!",
+    "I'm worried about what will happen after the transfer.",
+    "Honestly I don't want to talk to anyone right now.",
+    "Let's meet at 3pm near the main gate.",
+    "I am so angry about how that situation was handled.",
+]
+
+# 합성 대화 데이터 (한국어/영어 혼합, UTF-8 기준 목표 크기까지 생성)
+def make_chat_fixture(size_bytes: int, seed: int = 2158) -> str:
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        if rng.random() < 0.7:
+            line = f"{rng.choice(KOREAN_SPEAKERS)}: {rng.choice(KOREAN_SENTENCES)}"
+        else:
+            line = f"{rng.choice(ENGLISH_SPEAKERS)}: {rng.choice(ENGLISH_SENTENCES)}"
+        lines.append(line)
+        total += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+# 합성 음성 데이터 (음절 단위로 켜졌다 꺼지는 배음 + 잡음, 16kHz PCM WAV)
+def make_audio_fixture(duration_sec: float, sr: int = app.WHISPER_SAMPLE_RATE, seed: int = 2158) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration_sec * sr)) / sr
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 4 * t) > -0.2).astype(np.float32) * (np.sin(2 * np.pi * 0.25 * t) > -0.6)
+    signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for suffix, factor in (("MB", 1024 * 1024), ("KB", 1024), ("B", 1)):
+        if value.endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+# 현재 RSS (MB)
+def current_rss_mb():
+    rss = app.current_rss_bytes()
+    return rss / 1024 / 1024 if rss is not None else None
+
+# 측정 구간 동안 백그라운드 스레드로 RSS를 읽어 구간 안의 최대값 기록
+# (ru_maxrss는 프로세스 시작 이후 최대값이라 앞 단계에서 올라간 값이 이후 모든 행에 그대로 찍힘)
+RSS_SAMPLE_SECONDS = 0.01
+
+class RssSampler:
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+def measure(func, repeats: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        func()
+    rss_before = current_rss_mb()
+    latencies = []
+    with RssSampler() as sampler:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - started)
+    rss_after = current_rss_mb()
+    peak = sampler.peak
+    return {
+        "repeats": repeats,
+        "p50_sec": round(percentile(latencies, 0.5), 6),
+        "p95_sec": round(percentile(latencies, 0.95), 6),
+        "mean_sec": round(sum(latencies) / len(latencies), 6),
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+        "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+    }
+
+def time_model_load(loader) -> dict:
+    rss_before = current_rss_mb()
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        loader()
+        elapsed = time.perf_counter() - started
+    rss_after = current_rss_mb()
+    return {
+        "load_sec": round(elapsed, 3),
+        "peak_rss_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+        "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+    }
+
+def bench_text_stages(stages: list, sizes: list, repeats: int) -> list:
+    rows = []
+    for size in sizes:
+        text = make_chat_fixture(size)
+        text_bytes = len(text.encode("utf-8"))
+        results = app.analyze_texts([text], use_cache=False)
+        participants = app.extract_person_names(text)
+        cleaned = results.get("cleaned_text", app.clean_text(text))
+
+        runners = {
+            "clean_text": lambda: app.clean_text(text),
+            "extract_person_names": lambda: app.extract_person_names(text),
+            "analyze_texts": lambda: app.analyze_texts([text], use_cache=False),
+            "generate_final_report": lambda: app.generate_final_report(results, participants, cleaned),
+        }
+        for stage in stages:
+            if stage not in runners:
+                continue
+            if stage == "generate_final_report" and "cleaned_text" not in results:
+                continue
+            row = {"stage": stage, "input_bytes": text_bytes}
+            row.update(measure(runners[stage], repeats))
+            row["throughput_bytes_per_sec"] = round(text_bytes / row["p50_sec"], 1) if row["p50_sec"] > 0 else None
+            rows.append(row)
+            print(f"{stage:<24} {text_bytes:>9}B  p50 {row['p50_sec'] * 1000:9.2f}ms  p95 {row['p95_sec'] * 1000:9.2f}ms", file=sys.stderr)
+    return rows
+
+def bench_audio_stages(durations: list, repeats: int) -> list:
+    rows = []
+    for duration in durations:
+        audio_bytes = make_audio_fixture(duration)
+
+        def run():
+            buffer = io.BytesIO(audio_bytes)
+            buffer.name = "synthetic.wav"
+            app.transcribe_audio(buffer, use_cache=False)
+
+        row = {"stage": "transcribe_audio", "audio_sec": duration, "input_bytes": len(audio_bytes)}
+        row.update(measure(run, repeats, warmup=0))
+        # 실시간 대비 처리 속도 (1초 동안 처리한 음성 길이, 초)
+        row["throughput_audio_sec_per_sec"] = round(duration / row["p50_sec"], 2) if row["p50_sec"] > 0 else None
+        rows.append(row)
+        print(f"transcribe_audio         {duration:>8}s  p50 {row['p50_sec']:9.2f}s   p95 {row['p95_sec']:9.2f}s", file=sys.stderr)
+    return rows
+
+# 최적화 백엔드(ONNX/양자화, faster-whisper/int8)가 PyTorch fp32 기준과 허용 범위 이내인지 확인
+def run_parity_checks(audio_path: str = None) -> dict:
+    checks = {}
+    if app.EMOTION_BACKEND != "torch":
+        languages = ["en", "ko"] if app.EMOTION_LANGUAGE_ROUTING else ["en"]
+        for language in languages:
+            model_name = app.EMOTION_MODELS[language]
+            analyzer = app.build_emotion_pipeline(app.EMOTION_BACKEND, model_name)
+            checks[f"emotion_{language}"] = app.check_emotion_backend_parity(analyzer, model_name)
+    if app.WHISPER_BACKEND != "torch":
+        # 합성 음성은 인식 결과가 비어 비교가 의미 없으므로 실제 녹음 파일로만 확인
+        if audio_path:
+            with open(audio_path, "rb") as f:
+                audio = app.decode_audio_bytes(f.read(), os.path.splitext(audio_path)[1].lower())
+            # 로딩 시 확인에서 PyTorch로 대체된 모델이 아니라 설정한 백엔드 그대로 비교
+            model = app.build_whisper_model(app.WHISPER_BACKEND, app.WHISPER_MODEL_NAME)
+            checks["whisper"] = app.check_whisper_backend_parity(audio, app.WHISPER_MODEL_NAME, model=model)
+        else:
+            print("Whisper 백엔드 비교는 --parity-audio(또는 WHISPER_PARITY_AUDIO)로 음성 파일을 지정해야 실행됩니다.", file=sys.stderr)
+    for name, check in checks.items():
+        print(f"{name:<12} {'통과' if check['passed'] else '실패'}", file=sys.stderr)
+    return checks
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_meta() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "emotion_model": app.EMOTION_MODEL_NAME,
+        "emotion_backend": app.EMOTION_BACKEND,
+        "korean_emotion_model": app.KOREAN_EMOTION_MODEL_NAME if app.EMOTION_LANGUAGE_ROUTING else None,
+        "whisper_model": app.WHISPER_MODEL_NAME,
+        "whisper_backend": app.WHISPER_BACKEND,
+    }
+
+def write_report(report: dict, path: str = None):
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="STT/감정 분석 파이프라인 성능 측정")
+    parser.add_argument("--stages", nargs="+", default=list(TEXT_STAGES + AUDIO_STAGES), choices=TEXT_STAGES + AUDIO_STAGES)
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES), help="텍스트 크기 (예: 1KB 10KB 1MB)")
+    parser.add_argument("--durations", nargs="+", type=float, default=list(DEFAULT_DURATIONS), help="합성 음성 길이(초)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--audio-repeats", type=int, default=1)
+    parser.add_argument("--parity", action="store_true", help="성능 측정 대신 백엔드 점수 일치 여부만 확인 (허용 범위를 넘으면 종료 코드 1)")
+    parser.add_argument("--parity-audio", default=app.WHISPER_PARITY_AUDIO or None, help="Whisper 백엔드 비교에 사용할 음성 파일")
+    parser.add_argument("-o", "--output", help="결과 JSON 경로 (지정하지 않으면 표준 출력)")
+    args = parser.parse_args(argv)
+
+    if args.parity:
+        checks = run_parity_checks(args.parity_audio)
+        write_report({"meta": run_meta(), "parity": checks}, args.output)
+        return 0 if all(check["passed"] for check in checks.values()) else 1
+
+    text_stages = [s for s in args.stages if s in TEXT_STAGES]
+    audio_stages = [s for s in args.stages if s in AUDIO_STAGES]
+
+    # 모델 로딩 시간은 처음 한 번만 측정 (이후 단계는 로딩이 끝난 상태에서 측정)
+    model_load = {}
+    if text_stages:
+        model_load["emotion"] = time_model_load(app.load_emotion_model)
+        # 합성 대화의 70%가 한국어라 언어별 분기가 켜져 있으면 다국어 모델 로딩도 따로 측정
+        if app.EMOTION_LANGUAGE_ROUTING:
+            model_load["emotion_ko"] = time_model_load(lambda: app.load_emotion_model("ko"))
+    if audio_stages:
+        model_load["whisper"] = time_model_load(app.load_whisper_model)
+
+    results = []
+    if text_stages:
+        results.extend(bench_text_stages(text_stages, [parse_size(s) for s in args.sizes], args.repeats))
+    if audio_stages:
+        results.extend(bench_audio_stages(args.durations, args.audio_repeats))
+
+    report = {
+        "meta": run_meta(),
+        "model_load": model_load,
+        "results": results,
+    }
+    write_report(report, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import time
+
+import app
+
+# 디렉터리 전체 크기 (바이트)
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+# 감정 모델: 토크나이저와 가중치(safetensors)를 transformers 형식 그대로 저장
+def bundle_emotion_model(model_name: str, bundle_dir: str) -> dict:
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    target = app.bundled_emotion_model_dir(model_name, bundle_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(target)
+    AutoModelForSequenceClassification.from_pretrained(model_name).save_pretrained(target, safe_serialization=True)
+    return {"kind": "emotion", "name": model_name, "path": os.path.relpath(target, bundle_dir), "bytes": directory_size(target)}
+
+# Whisper: fp32 state_dict를 safetensors로, 모델 구조는 dims.json으로 저장 (CPU 추론 시 변환 없이 mmap으로 바로 사용)
+def bundle_whisper_model(model_name: str, bundle_dir: str) -> dict:
+    import whisper
+    from safetensors.torch import save_file
+    model = whisper.load_model(model_name, device="cpu")
+    target = app.bundled_whisper_model_dir(model_name, bundle_dir)
+    os.makedirs(target, exist_ok=True)
+    state = {name: tensor.contiguous() for name, tensor in model.state_dict().items()}
+    save_file(state, os.path.join(target, "model.safetensors"))
+    with open(os.path.join(target, "dims.json"), "w", encoding="utf-8") as f:
+        json.dump(dataclasses.asdict(model.dims), f, indent=2)
+    return {"kind": "whisper", "name": model_name, "path": os.path.relpath(target, bundle_dir), "bytes": directory_size(target)}
+
+# faster-whisper: CTranslate2 변환 모델을 그대로 내려받아 저장
+def bundle_faster_whisper_model(model_name: str, bundle_dir: str) -> dict:
+    try:
+        from faster_whisper import download_model
+    except ImportError as e:
+        raise ImportError("--faster 옵션을 사용하려면 'faster-whisper' 패키지가 필요합니다.") from e
+    target = app.bundled_faster_whisper_dir(model_name, bundle_dir)
+    download_model(model_name, output_dir=target)
+    return {"kind": "faster-whisper", "name": model_name, "path": os.path.relpath(target, bundle_dir), "bytes": directory_size(target)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="인터넷 연결 없이 실행하기 위한 모델 번들 생성 (MODEL_BUNDLE_DIR로 지정해 사용)")
+    parser.add_argument("bundle_dir", nargs="?", default=app.MODEL_BUNDLE_DIR or "model_bundle", help="번들을 저장할 디렉터리")
+    parser.add_argument("--whisper", nargs="+", default=app.WHISPER_MODEL_CHOICES, help="포함할 Whisper 모델 크기")
+    parser.add_argument("--faster", action="store_true", help="faster-whisper 모델도 함께 저장")
+    parser.add_argument("--no-korean", action="store_true", help="한국어 감정 모델은 포함하지 않음")
+    args = parser.parse_args(argv)
+
+    if app.OFFLINE_MODE:
+        print("OFFLINE_MODE에서는 모델을 내려받을 수 없습니다. 인터넷에 연결된 환경에서 OFFLINE_MODE=0으로 실행하세요.", file=sys.stderr)
+        return 1
+
+    emotion_models = [app.EMOTION_MODEL_NAME]
+    if app.EMOTION_LANGUAGE_ROUTING and not args.no_korean:
+        emotion_models.append(app.KOREAN_EMOTION_MODEL_NAME)
+
+    started = time.perf_counter()
+    entries = []
+    for model_name in emotion_models:
+        print(f"감정 모델 저장 중: {model_name}", file=sys.stderr)
+        entries.append(bundle_emotion_model(model_name, args.bundle_dir))
+    for model_name in args.whisper:
+        print(f"Whisper 모델 저장 중: {model_name}", file=sys.stderr)
+        entries.append(bundle_whisper_model(model_name, args.bundle_dir))
+        if args.faster:
+            entries.append(bundle_faster_whisper_model(model_name, args.bundle_dir))
+
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "models": entries,
+    }
+    with open(os.path.join(args.bundle_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+    summary = {
+        "bundle_dir": os.path.abspath(args.bundle_dir),
+        "models": len(entries),
+        "total_mb": round(sum(e["bytes"] for e in entries) / 1024 / 1024, 1),
+        "elapsed_sec": round(time.perf_counter() - started, 1),
+    }
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# app.py는 저장소 최상위의 단일 모듈이므로 테스트에서 바로 import할 수 있도록 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
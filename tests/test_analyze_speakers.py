@@ -0,0 +1,11 @@
+import app
+
+
+def fail_scoring(*args, **kwargs):
+    raise AssertionError("화자 줄이 없으면 감정 추론을 하지 않아야 함")
+
+
+def test_text_without_named_speakers_is_not_scored(monkeypatch):
+    monkeypatch.setattr(app, "score_cleaned_texts", fail_scoring)
+    monkeypatch.setattr(app, "score_cleaned_texts_cached", fail_scoring)
+    assert app.analyze_speakers("오늘 훈련은 정말 힘들었어요 그래도 괜찮아요") == {}
@@ -0,0 +1,22 @@
+import io
+
+import app
+
+
+def decoded_lines(data: bytes, chunk_size: int = app.TEXT_DECODE_CHUNK_BYTES) -> list:
+    return list(app.iter_decoded_lines(io.BytesIO(data), chunk_size=chunk_size))
+
+
+def test_cr_only_line_endings():
+    assert decoded_lines("민수: 안녕\r영희: 응\r".encode("utf-8")) == ["민수: 안녕", "영희: 응"]
+
+
+def test_crlf_split_across_chunks_is_one_line_break():
+    data = ("a" * (app.TEXT_SNIFF_BYTES - 1) + "\r\n민수: 응\r\n영희: 그래").encode("utf-8")
+    assert decoded_lines(data, chunk_size=1)[1:] == ["민수: 응", "영희: 그래"]
+
+
+def test_cp949_after_long_ascii_prefix():
+    data = b"a" * 70000 + "\r\n민수: 슬퍼요".encode("cp949")
+    assert decoded_lines(data)[-1] == "민수: 슬퍼요"
+    assert app.decode_text_bytes(data).endswith("민수: 슬퍼요")
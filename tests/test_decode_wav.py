@@ -0,0 +1,80 @@
+import struct
+
+import numpy as np
+
+import app
+
+KSDATAFORMAT_SUBTYPE_TAIL = b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+
+
+def chunk(chunk_id: bytes, body: bytes) -> bytes:
+    # RIFF 청크는 짝수 바이트로 정렬 (홀수 크기면 패딩 1바이트)
+    return chunk_id + struct.pack("<I", len(body)) + body + (b"\x00" if len(body) & 1 else b"")
+
+
+def fmt_body(format_tag: int, channels: int, sample_rate: int, bits: int) -> bytes:
+    block_align = channels * bits // 8
+    return struct.pack("<HHIIHH", format_tag, channels, sample_rate, sample_rate * block_align, block_align, bits)
+
+
+def extensible_fmt_body(sub_format: int, channels: int, sample_rate: int, bits: int) -> bytes:
+    return (fmt_body(app.WAV_FORMAT_EXTENSIBLE, channels, sample_rate, bits)
+            + struct.pack("<HHI", 22, bits, 0) + struct.pack("<H", sub_format) + KSDATAFORMAT_SUBTYPE_TAIL)
+
+
+def riff(*chunks: bytes) -> bytes:
+    body = b"WAVE" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def test_pcm16_mono():
+    samples = np.array([0, 16384, -32768, 32767], dtype="<i2")
+    audio = app.decode_wav_bytes(riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 16000, 16)), chunk(b"data", samples.tobytes())))
+    assert audio.dtype == np.float32
+    np.testing.assert_allclose(audio, samples / 32768.0)
+
+
+def test_odd_sized_chunk_before_data_is_padded():
+    samples = np.array([100, -100, 200], dtype="<i2")
+    data = riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 16000, 16)), chunk(b"LIST", b"abc"), chunk(b"data", samples.tobytes()))
+    np.testing.assert_allclose(app.decode_wav_bytes(data), samples / 32768.0)
+
+
+def test_extensible_pcm():
+    samples = np.array([[1000, 3000], [-2000, 0]], dtype="<i2")
+    data = riff(chunk(b"fmt ", extensible_fmt_body(app.WAV_FORMAT_PCM, 2, 16000, 16)), chunk(b"data", samples.tobytes()))
+    np.testing.assert_allclose(app.decode_wav_bytes(data), samples.mean(axis=1) / 32768.0)
+
+
+def test_extensible_float():
+    samples = np.array([0.5, -0.25], dtype="<f4")
+    data = riff(chunk(b"fmt ", extensible_fmt_body(app.WAV_FORMAT_FLOAT, 1, 16000, 32)), chunk(b"data", samples.tobytes()))
+    np.testing.assert_allclose(app.decode_wav_bytes(data), samples)
+
+
+def test_sample_rate_mismatch_returns_none():
+    samples = np.zeros(4, dtype="<i2")
+    data = riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 44100, 16)), chunk(b"data", samples.tobytes()))
+    assert app.decode_wav_bytes(data) is None
+
+
+def test_unsupported_sample_format_returns_none():
+    data = riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 16000, 8)), chunk(b"data", b"\x80\x80"))
+    assert app.decode_wav_bytes(data) is None
+
+
+def test_truncated_data_chunk_reads_available_frames():
+    samples = np.array([1, 2, 3], dtype="<i2")
+    data = riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 16000, 16)))
+    data += b"data" + struct.pack("<I", 1000) + samples.tobytes() + b"\x07"
+    np.testing.assert_allclose(app.decode_wav_bytes(data), samples / 32768.0)
+
+
+def test_short_fmt_chunk_returns_none():
+    data = riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 16000, 16)[:12]), chunk(b"data", b"\x00\x00"))
+    assert app.decode_wav_bytes(data) is None
+
+
+def test_truncated_fmt_chunk_returns_none():
+    data = riff(chunk(b"fmt ", fmt_body(app.WAV_FORMAT_PCM, 1, 16000, 16)))[:28]
+    assert app.decode_wav_bytes(data) is None
@@ -0,0 +1,39 @@
+import app
+
+
+def utterance_texts(normalized):
+    return [(speaker, normalized.cleaned[start:end]) for speaker, start, end in normalized.utterances]
+
+
+def test_continuation_lines_belong_to_previous_speaker():
+    normalized = app.normalize_lines(iter(["민수: 안녕", "오늘은 좀 힘들어", "영희: 그래?"]))
+    assert utterance_texts(normalized) == [("민수", "안녕 오늘은 좀 힘들어"), ("영희", "그래?")]
+    assert normalized.participants == ["민수", "영희"]
+
+
+def test_speaker_line_with_empty_content_starts_at_next_line():
+    normalized = app.normalize_lines(iter(["민수:", "슬퍼요", "영희: 응"]))
+    assert utterance_texts(normalized) == [("민수", "슬퍼요"), ("영희", "응")]
+
+
+def test_speaker_line_with_only_whitespace_has_no_utterance():
+    normalized = app.normalize_lines(iter(["민수:   ", "영희: 응"]))
+    assert utterance_texts(normalized) == [("영희", "응")]
+    assert normalized.participants == ["민수", "영희"]
+
+
+def test_lines_before_first_speaker_are_unknown_speaker():
+    normalized = app.normalize_lines(iter(["인사말", "민수: 안녕"]))
+    assert utterance_texts(normalized) == [(app.UNKNOWN_SPEAKER, "인사말"), ("민수", "안녕")]
+
+
+def test_blank_lines_are_skipped_but_counted():
+    lines = ["민수: 안녕", "", "   ", "민수: 또"]
+    normalized = app.normalize_lines(iter(lines))
+    assert utterance_texts(normalized) == [("민수", "안녕"), ("민수", "또")]
+    assert normalized.char_count == sum(len(line) for line in lines)
+
+
+def test_streamed_lines_match_whole_text():
+    lines = ["민수: 안녕하세요", "오늘 훈련은 어땠어?", "영희:", "힘들었어요 ㅠㅠ", "", "Alex: fine"]
+    assert app.normalize_lines(iter(lines)) == app.normalize_text("\n".join(lines))